@@ -1,14 +1,25 @@
 import os
+import gzip
 import json
+import sqlite3
 import requests
 from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
+from fundamentalsStore import FundamentalsStore
 
 
 class EODHDHandler:
-    def __init__(self):
-        """Initialize the EODHD API handler."""
+    def __init__(self, compress_logs=False, max_log_bytes=50 * 1024 * 1024, store=None):
+        """
+        Initialize the EODHD API handler.
+        
+        Args:
+            compress_logs (bool): Write new log entries gzip-compressed
+            max_log_bytes (int): Start a new log segment once the current one grows past this size
+            store (FundamentalsStore): Where fetched fundamentals are kept and read
+                back from before spending a call (default: data/fundamentals/)
+        """
         load_dotenv()
         self._api_key = os.getenv('EODHD_API_KEY')
         self._daily_limit = int(os.getenv('EODHD_DAILY_LIMIT', 19))
@@ -17,29 +28,47 @@ class EODHDHandler:
         self._log_dir = Path('logs')
         self._log_dir.mkdir(exist_ok=True)
         
-        self._structured_log_file = self._log_dir / 'eodhd_log.json'
-        self._raw_log_file = self._log_dir / 'eodhd_log_raw.json'
-        self._daily_fields_file = self._log_dir / 'daily_fields.json'
+        # Logs are append-only, one JSON object per line (or one gzip member per entry), split into
+        # numbered segments (eodhd_log.000000.jsonl, ...). Files are never renamed and the index is
+        # never rewritten, so several processes can log at once. The index has one small line per
+        # entry: ticker, timestamp and the segment + offset it lives at, so old responses can be
+        # read back without loading every prior response.
+        self._compress_logs = compress_logs
+        self._max_log_bytes = max_log_bytes
+        suffix = '.jsonl.gz' if compress_logs else '.jsonl'
+        self._structured_log_file = self._log_dir / f'eodhd_log{suffix}'  # segment names derive from these
+        self._raw_log_file = self._log_dir / f'eodhd_log_raw{suffix}'
+        self._log_segments = {}  # base log file -> segment currently appended to
+        self._log_index_file = self._log_dir / 'eodhd_log_index.jsonl'
+        self._log_index = []
+        self._log_index_pos = 0  # how far into the index file self._log_index has read
+        
+        # Pre-JSONL logs (one big JSON array), migrated on first run
+        self._legacy_structured_log_file = self._log_dir / 'eodhd_log.json'
+        self._legacy_raw_log_file = self._log_dir / 'eodhd_log_raw.json'
+        self._daily_fields_file = self._log_dir / 'daily_fields.json'  # old call counter, migrated once
+        self._counter_db = self._log_dir / 'eodhd_calls.sqlite'
+        self._queue_file = self._log_dir / 'eodhd_queue.json'
+        
+        # One pooled session for every request, instead of a fresh connection per ticker
+        self._session = requests.Session()
         
         # Initialize log files if they don't exist
         self._initialize_log_files()
         
-        # Load current call count
-        self._call_count = self._get_today_call_count()
+        # Calls this handler has spent (the shared count for today lives in the counter db)
+        self._calls_made = 0
+        # HTTP status of the last failed get_ticker_response (None for network errors)
+        self._last_error_status = None
+        
+        self._store = store if store is not None else FundamentalsStore()
+        if len(self._store) == 0:
+            self._seed_store_from_logs()
     
     def _initialize_log_files(self):
-        """Create log files if they don't exist."""
-        if not self._structured_log_file.exists():
-            with open(self._structured_log_file, 'w') as f:
-                json.dump([], f)
-        
-        if not self._raw_log_file.exists():
-            with open(self._raw_log_file, 'w') as f:
-                json.dump([], f)
-        
-        if not self._daily_fields_file.exists():
-            with open(self._daily_fields_file, 'w') as f:
-                json.dump({}, f)
+        """Create log files and the call counter if they don't exist, migrating old formats."""
+        self._migrate_legacy_logs()
+        self._initialize_counter()
     
     def _get_today_date(self):
         """Get today's date in EST as a string (YYYY-MM-DD)."""
@@ -48,36 +77,159 @@ class EODHDHandler:
         est = timezone(timedelta(hours=-5))
         return datetime.now(est).strftime('%Y-%m-%d')
     
-    def _get_today_call_count(self):
-        """Get the number of API calls made today."""
-        today = self._get_today_date()
+    def _connect_counter(self):
+        """
+        Open the call counter database.
         
-        with open(self._daily_fields_file, 'r') as f:
-            daily_data = json.load(f)
+        SQLite does the locking, so any number of processes can share one counter.
+        isolation_level=None leaves transactions to us (BEGIN IMMEDIATE below).
+        """
+        conn = sqlite3.connect(self._counter_db, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+    
+    def _initialize_counter(self):
+        """Create the counter table, carrying over counts from daily_fields.json the first time."""
+        conn = self._connect_counter()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='calls'").fetchone()
+            if not exists:
+                conn.execute('CREATE TABLE calls (day TEXT PRIMARY KEY, count INTEGER NOT NULL)')
+                if self._daily_fields_file.exists():
+                    with open(self._daily_fields_file, 'r') as f:
+                        daily_data = json.load(f)
+                    conn.executemany('INSERT INTO calls (day, count) VALUES (?, ?)',
+                                     [(day, fields.get('eodhd_calls', 0)) for day, fields in daily_data.items()])
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+    
+    def _get_today_call_count(self):
+        """Get the number of API calls made today (by every process sharing the logs dir)."""
+        conn = self._connect_counter()
+        try:
+            row = conn.execute('SELECT count FROM calls WHERE day = ?', (self._get_today_date(),)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+    
+    def _reserve_call(self):
+        """
+        Atomically claim one of today's calls.
         
-        if today not in daily_data:
-            daily_data[today] = {'eodhd_calls': 0}
-            with open(self._daily_fields_file, 'w') as f:
-                json.dump(daily_data, f, indent=2)
+        BEGIN IMMEDIATE takes the write lock before reading, so two processes
+        can never both see the last free call.
         
-        return daily_data[today].get('eodhd_calls', 0)
-    
-    def _increment_call_count(self):
-        """Increment today's API call count."""
+        Returns:
+            bool: True if a call was reserved, False if the daily limit is reached
+        """
         today = self._get_today_date()
+        conn = self._connect_counter()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT count FROM calls WHERE day = ?', (today,)).fetchone()
+            count = row[0] if row else 0
+            if count >= self._daily_limit:
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute('INSERT INTO calls (day, count) VALUES (?, 1) '
+                         'ON CONFLICT(day) DO UPDATE SET count = count + 1', (today,))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        self._calls_made += 1
+        return True
+    
+    def _release_call(self):
+        """Give back a reserved call that didn't count toward the limit (e.g. a network error)."""
+        conn = self._connect_counter()
+        try:
+            conn.execute('UPDATE calls SET count = MAX(count - 1, 0) WHERE day = ?', (self._get_today_date(),))
+        finally:
+            conn.close()
+        self._calls_made -= 1
+    
+    def _migrate_legacy_logs(self):
+        """Move entries from the old whole-file JSON array logs into the JSONL logs (once)."""
+        for legacy, target, key in [(self._legacy_structured_log_file, self._structured_log_file, 'response'),
+                                    (self._legacy_raw_log_file, self._raw_log_file, 'raw_response')]:
+            if not legacy.exists():
+                continue
+            with open(legacy, 'r') as f:
+                entries = json.load(f)
+            for entry in entries:
+                data = entry.get(key)
+                is_error = isinstance(data, dict) and 'error' in data
+                self._append_log_entry(target, entry, index=(target == self._structured_log_file), is_error=is_error)
+            legacy.rename(legacy.with_suffix('.json.migrated'))
+            print(f"Migrated {len(entries)} entries from {legacy} to {target}")
+    
+    def _segment_path(self, log_file, number):
+        """Numbered segment of a base log file (eodhd_log.jsonl -> eodhd_log.000003.jsonl)."""
+        return log_file.with_name(log_file.name.replace('.jsonl', f'.{number:06d}.jsonl', 1))
+    
+    def _latest_segment(self, log_file):
+        """Number of the highest existing segment of log_file, or 0 if there are none yet."""
+        prefix, rest = log_file.name.split('.jsonl', 1)
+        numbers = [0]
+        for path in self._log_dir.glob(f'{prefix}.*.jsonl{rest}'):
+            middle = path.name[len(prefix) + 1:-len('.jsonl' + rest)]
+            if len(middle) == 6 and middle.isdigit():
+                numbers.append(int(middle))
+        return max(numbers)
+    
+    def _current_segment(self, log_file):
+        """
+        The segment of log_file to append the next entry to.
         
-        with open(self._daily_fields_file, 'r') as f:
-            daily_data = json.load(f)
+        Moves on to a new segment once the current one is past max_log_bytes. Full
+        segments are left where they are, so offsets in the index stay valid; if two
+        processes move on at once they just both append to the same new segment.
+        """
+        segment = self._log_segments.get(log_file)
+        if segment is None or (segment.exists() and segment.stat().st_size >= self._max_log_bytes):
+            # another process may already have moved on, so look at what's on disk
+            number = self._latest_segment(log_file)
+            segment = self._segment_path(log_file, number)
+            if segment.exists() and segment.stat().st_size >= self._max_log_bytes:
+                segment = self._segment_path(log_file, number + 1)
+            self._log_segments[log_file] = segment
+        return segment
+    
+    def _append_log_entry(self, log_file, entry, index=False, is_error=False):
+        """
+        Append one entry to the current segment of a log file in O(1), and optionally record it in the index.
         
-        if today not in daily_data:
-            daily_data[today] = {'eodhd_calls': 0}
+        Plain logs get one JSON line per entry. Compressed logs get one gzip member per
+        entry (concatenated gzip members are still one valid .gz file), so a single
+        entry can be decompressed on its own from its offset.
+        """
+        segment = self._current_segment(log_file)
         
-        daily_data[today]['eodhd_calls'] += 1
+        line = (json.dumps(entry) + '\n').encode('utf-8')
+        if log_file.suffix == '.gz':
+            line = gzip.compress(line)
         
-        with open(self._daily_fields_file, 'w') as f:
-            json.dump(daily_data, f, indent=2)
+        with open(segment, 'ab') as f:
+            f.write(line)
+            f.flush()
+            # in append mode the write lands at the end even if another process wrote first,
+            # so the offset is taken after the write rather than before it
+            offset = f.tell() - len(line)
         
-        self._call_count += 1
+        if index:
+            index_entry = {
+                'ticker': entry['ticker'],
+                'timestamp': entry['timestamp'],
+                'file': segment.name,
+                'offset': offset,
+                'length': len(line),
+                'is_error': is_error,
+            }
+            with open(self._log_index_file, 'a') as f:
+                f.write(json.dumps(index_entry) + '\n')
     
     def _log_response(self, ticker, response_data, is_error=False):
         """Log the API response to both structured and raw log files."""
@@ -89,12 +241,7 @@ class EODHDHandler:
             'ticker': ticker,
             'response': response_data
         }
-        
-        with open(self._structured_log_file, 'r') as f:
-            logs = json.load(f)
-        logs.append(structured_entry)
-        with open(self._structured_log_file, 'w') as f:
-            json.dump(logs, f, indent=2)
+        self._append_log_entry(self._structured_log_file, structured_entry, index=True, is_error=is_error)
         
         # Raw log
         raw_entry = {
@@ -102,23 +249,106 @@ class EODHDHandler:
             'ticker': ticker,
             'raw_response': response_data
         }
+        self._append_log_entry(self._raw_log_file, raw_entry)
+    
+    def _load_log_index(self):
+        """
+        Return the log index (small: one line per logged call).
+        
+        The index file is only ever appended to, so each call just reads the lines
+        added since the last one -- including entries other processes logged.
+        """
+        if self._log_index_file.exists():
+            with open(self._log_index_file, 'rb') as f:
+                f.seek(self._log_index_pos)
+                data = f.read()
+            # a line another process is halfway through writing is picked up next time
+            end = data.rfind(b'\n') + 1
+            self._log_index.extend(json.loads(line) for line in data[:end].splitlines() if line.strip())
+            self._log_index_pos += end
+        return self._log_index
+    
+    def _read_log_entry(self, index_entry):
+        """Read a single logged entry back using its offset from the index."""
+        path = self._log_dir / index_entry['file']
+        with open(path, 'rb') as f:
+            f.seek(index_entry['offset'])
+            data = f.read(index_entry['length'])
+        if path.suffix == '.gz':
+            data = gzip.decompress(data)
+        return json.loads(data)
+    
+    def get_logged_responses(self, ticker=None, since=None, until=None, include_errors=False):
+        """
+        Look up logged responses through the index, reading only the matching entries.
+        
+        Args:
+            ticker (str): Only this ticker (e.g. "NVDA.US"), or every ticker if None
+            since (str): Only entries with timestamp >= this ISO timestamp
+            until (str): Only entries with timestamp <= this ISO timestamp
+            include_errors (bool): Also return entries that logged an error
         
-        with open(self._raw_log_file, 'r') as f:
-            raw_logs = json.load(f)
-        raw_logs.append(raw_entry)
-        with open(self._raw_log_file, 'w') as f:
-            json.dump(raw_logs, f, indent=2)
+        Returns:
+            list: Structured log entries ({'timestamp', 'ticker', 'response'}), oldest first
+        """
+        matches = []
+        for index_entry in self._load_log_index():
+            if ticker is not None and index_entry['ticker'] != ticker:
+                continue
+            if since is not None and index_entry['timestamp'] < since:
+                continue
+            if until is not None and index_entry['timestamp'] > until:
+                continue
+            if index_entry['is_error'] and not include_errors:
+                continue
+            matches.append(index_entry)
+        return [self._read_log_entry(e) for e in matches]
+    
+    def _latest_logged(self):
+        """Index entry of the most recent successful response for each ticker."""
+        latest = {}
+        for index_entry in self._load_log_index():
+            if not index_entry['is_error']:
+                latest[index_entry['ticker']] = index_entry
+        return latest
+    
+    def _seed_store_from_logs(self):
+        """Fill an empty fundamentals store from responses already in the logs."""
+        latest = self._latest_logged()
+        for ticker, index_entry in latest.items():
+            self._store.put(ticker, self._read_log_entry(index_entry)['response'], fetched_at=index_entry['timestamp'])
+        if latest:
+            print(f"Seeded fundamentals store with {len(latest)} tickers from the logs")
+    
+    @property
+    def store(self):
+        """The FundamentalsStore responses are cached in."""
+        return self._store
+    
+    def cached_responses(self):
+        """
+        Return the most recent successful response logged for each ticker.
+        
+        Returns:
+            dict: ticker symbol (e.g. "NVDA.US") -> response data
+        """
+        return {ticker: self._read_log_entry(e)['response'] for ticker, e in self._latest_logged().items()}
     
     def remaining_calls(self):
         """Return the number of remaining API calls available today."""
-        return max(0, self._daily_limit - self._call_count)
+        return max(0, self._daily_limit - self._get_today_call_count())
     
-    def get_ticker_response(self, ticker_symbol):
+    def get_ticker_response(self, ticker_symbol, refresh=False, max_age_days=None):
         """
         Fetch fundamentals data for a given ticker symbol.
         
+        The local store is checked first; a call is only spent if the ticker
+        isn't stored yet, its entry is stale, or refresh=True.
+        
         Args:
             ticker_symbol (str): The ticker symbol (e.g., "NVDA.US")
+            refresh (bool): Skip the store and always call the API
+            max_age_days (float): Override the store's staleness policy for this read
         
         Returns:
             dict: The API response data, or None if limit reached or error
@@ -126,8 +356,14 @@ class EODHDHandler:
         Raises:
             Exception: If daily limit is reached
         """
-        # Check if we've hit the daily limit
-        if self._call_count >= self._daily_limit:
+        if not refresh:
+            stored = self._store.get(ticker_symbol, max_age_days)
+            if stored is not None:
+                return stored
+        
+        # Reserve a call up front, so concurrent workers can't race past the daily limit.
+        # A crash after this point leaves the call counted -- over-counting is the safe side.
+        if not self._reserve_call():
             raise Exception(f"Daily API call limit of {self._daily_limit} reached. "
                           f"Resets at 12am EST.")
         
@@ -138,26 +374,194 @@ class EODHDHandler:
             'fmt': 'json'
         }
         
+        counted = False
+        self._last_error_status = None
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = self._session.get(url, params=params, timeout=10)
             
             # Check if we successfully reached the server
             # Count these status codes toward the limit
-            if response.status_code in [200, 400, 401, 429]:
-                self._increment_call_count()
+            counted = response.status_code in [200, 400, 401, 429]
+            if not counted:
+                self._release_call()
             
             response.raise_for_status()  # Raise exception for 4xx/5xx
             
             data = response.json()
             self._log_response(ticker_symbol, data)
+            self._store.put(ticker_symbol, data)
             return data
             
         except requests.exceptions.RequestException as e:
             # Network errors, DNS failures, timeouts - don't count
+            if e.response is None and not counted:
+                self._release_call()
+            self._last_error_status = e.response.status_code if e.response is not None else None
             error_data = {
                 'error': str(e),
                 'error_type': type(e).__name__
             }
             self._log_response(ticker_symbol, error_data, is_error=True)
             print(f"Error fetching data for {ticker_symbol}: {e}")
-            return None
\ No newline at end of file
+            return None
+    
+    def _load_queue(self):
+        """
+        Load the persisted work queue.
+        
+        {'pending': [...], 'done': [...], 'failed': [...], 'attempts': {ticker: counted failures}}
+        """
+        queue = {'pending': [], 'done': [], 'failed': [], 'attempts': {}}
+        if self._queue_file.exists():
+            with open(self._queue_file, 'r') as f:
+                queue.update(json.load(f))
+        return queue
+    
+    def _save_queue(self, queue):
+        """Persist the work queue (temp file + rename, so a crash can't corrupt it)."""
+        tmp = self._queue_file.with_suffix('.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(queue, f, indent=2)
+        os.replace(tmp, self._queue_file)
+    
+    def queue_tickers(self, ticker_symbols, refresh=False):
+        """
+        Add tickers to the persisted work queue.
+        
+        Tickers that aren't in the store go to the front, stale ones go to the
+        back, and fresh ones are skipped entirely unless refresh=True. Tickers that
+        failed for good (see run_queue) are skipped too, unless refresh=True.
+        
+        Args:
+            ticker_symbols (list): Ticker symbols (e.g. ["NVDA.US", "AAPL.US"])
+            refresh (bool): Re-fetch tickers that are already stored and fresh,
+                and give failed tickers another chance
+        
+        Returns:
+            int: Number of tickers pending after queueing
+        """
+        queue = self._load_queue()
+        cached = {t for t in set(ticker_symbols) | set(queue['pending']) if t in self._store}
+        pending = set(queue['pending'])
+        
+        failed = set(queue['failed'])
+        
+        missing = []
+        stale = []
+        for ticker in dict.fromkeys(ticker_symbols):
+            if ticker in pending:
+                continue
+            if ticker in failed:
+                if not refresh:
+                    continue
+                queue['failed'].remove(ticker)
+                queue['attempts'].pop(ticker, None)
+            if ticker not in cached:
+                missing.append(ticker)
+            elif refresh or self._store.get(ticker) is None:
+                stale.append(ticker)
+        
+        # Uncached work first, keep whatever was already waiting ahead of stale refreshes
+        uncached_pending = [t for t in queue['pending'] if t not in cached]
+        cached_pending = [t for t in queue['pending'] if t in cached]
+        queue['pending'] = uncached_pending + missing + cached_pending + stale
+        self._save_queue(queue)
+        return len(queue['pending'])
+    
+    def run_queue(self, max_calls=None, max_attempts=3):
+        """
+        Work through the persisted queue until it's empty or today's budget is spent.
+        
+        Whatever is left stays queued, so calling this again on a later day
+        resumes the crawl where it stopped. Network errors are retried on later
+        runs without limit (they don't cost a call). A 429 or 401 stops the run with
+        the ticker back at the front of the queue and no attempt charged, since every
+        other ticker would fail the same way. A 400 (e.g. an invalid symbol)
+        moves the ticker to queue['failed'] right away, and other counted errors do
+        after max_attempts, so a bad ticker can't spend a call every day forever.
+        
+        Args:
+            max_calls (int): Optional cap on calls to spend in this run
+            max_attempts (int): Counted failures before a ticker is given up on
+        
+        Returns:
+            dict: ticker symbol -> response data, for tickers fetched in this run
+        """
+        queue = self._load_queue()
+        results = {}
+        retry_later = []
+        budget = self.remaining_calls() if max_calls is None else min(max_calls, self.remaining_calls())
+        
+        while queue['pending'] and budget > 0:
+            ticker = queue['pending'].pop(0)
+            calls_before = self._calls_made
+            try:
+                # Everything queued is meant to be fetched, stored or not
+                data = self.get_ticker_response(ticker, refresh=True)
+            except Exception as e:
+                # Daily limit reached -- put it back and stop for today
+                print(f"Stopping fundamentals crawl: {e}")
+                queue['pending'].insert(0, ticker)
+                break
+            budget -= self._calls_made - calls_before
+            
+            if data is None:
+                status = self._last_error_status
+                if status in (401, 429):
+                    # Rate limited / bad key: every other ticker would fail the same way, so stop for now
+                    print(f"Stopping fundamentals crawl: HTTP {status}")
+                    queue['pending'].insert(0, ticker)
+                    break
+                if status is not None and status < 500:
+                    # Counted error: give up right away on a bad request, else after max_attempts
+                    queue['attempts'][ticker] = queue['attempts'].get(ticker, 0) + 1
+                    if status == 400 or queue['attempts'][ticker] >= max_attempts:
+                        print(f"Giving up on {ticker} after HTTP {status}")
+                        queue['failed'].append(ticker)
+                    else:
+                        retry_later.append(ticker)
+                else:
+                    # Network error / server trouble: try again on a later run
+                    retry_later.append(ticker)
+            else:
+                results[ticker] = data
+                queue['done'].append(ticker)
+                queue['attempts'].pop(ticker, None)
+            self._save_queue(dict(queue, pending=queue['pending'] + retry_later))
+        
+        queue['pending'] += retry_later
+        self._save_queue(queue)
+        
+        left = len(queue['pending'])
+        if left:
+            days = -(-left // max(self._daily_limit, 1))
+            print(f"{left} tickers still queued -- about {days} more day(s) at {self._daily_limit} calls/day. "
+                  f"Run run_queue() again after the reset at 12am EST to resume.")
+        return results
+    
+    def fetch_many(self, ticker_symbols, refresh=False):
+        """
+        Fetch fundamentals for many tickers against the daily budget.
+        
+        Tickers with a fresh entry in the store are answered without spending a
+        call (unless refresh=True). The rest are queued, fetched as far as today's budget allows,
+        and left in the persisted queue for later runs.
+        
+        Args:
+            ticker_symbols (list): Ticker symbols (e.g. ["NVDA.US", "AAPL.US"])
+            refresh (bool): Re-fetch tickers that are already stored and fresh
+        
+        Returns:
+            dict: ticker symbol -> response data, for every ticker available so far
+                (stale entries included, if they couldn't be refreshed yet)
+        """
+        self.queue_tickers(ticker_symbols, refresh=refresh)
+        fetched = self.run_queue()
+        
+        results = {}
+        for ticker in ticker_symbols:
+            entry = self._store.get_entry(ticker)
+            if entry is not None:
+                results[ticker] = entry['response']
+        results.update({t: d for t, d in fetched.items() if t in set(ticker_symbols)})
+        return results
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import time
+import stooqCache
+import indicators
+import resample
+from tickerSource import TickerSource
+
+# The goal from notes.txt: rank the most actively traded securities each year, per country.
+#
+# Walks every file in TickerSource.df (in chunks, across a process pool) and boils each series
+# down to one row per (symbol, year):
+#   TRADED_VALUE = sum of typical price x volume over the year
+#   NET_FLOW     = signed money flow (typical price up -> +, down -> -) summed over the year
+#   DAYS         = trading days that year
+#   FIRST_TRADE / LAST_TRADE = the symbol's first and last trade date overall
+#
+# Memory stays bounded: a worker holds one series at a time, and the parent only keeps the
+# running top-N per (country, year), merging each chunk's summary into it as it arrives.
+
+ranking_path = "data/results/annual_ranking.csv"
+
+summary_columns = ["TICKER", "COUNTRY", "EXCHANGE", "YEAR", "TRADED_VALUE", "NET_FLOW", "DAYS",
+                   "FIRST_TRADE", "LAST_TRADE"]
+
+
+# Per-year summary rows for one series (arrays from stooqCache.loadArrays)
+def summarizeSeries(arr) -> dict:
+    dates = np.asarray(arr["DATE"], dtype="datetime64[D]")
+    typical, raw, signed = indicators.moneyFlow(arr["HIGH"], arr["LOW"], arr["CLOSE"], arr["VOLUME"])
+
+    # dates are sorted, so each year is one contiguous run
+    keys, starts = resample.periodRuns(dates, "Y")
+    years = keys + 1970
+
+    return {
+        "YEAR": years[starts],
+        "TRADED_VALUE": np.add.reduceat(raw, starts),
+        "NET_FLOW": np.add.reduceat(signed, starts),
+        "DAYS": np.diff(np.r_[starts, len(dates)]),
+        "FIRST_TRADE": np.full(len(starts), dates[0]),
+        "LAST_TRADE": np.full(len(starts), dates[-1]),
+    }
+
+
+# rows = [(ticker, country, exchange, filepath), ...]
+# (module-level so ProcessPoolExecutor can pickle it)
+def _summarizeChunk(rows) -> pd.DataFrame:
+    frames = []
+    for (ticker, country, exchange, filepath), arr, meta in stooqCache.iterDailyArrays(rows):
+        summary = pd.DataFrame(summarizeSeries(arr))
+        frames.append(stooqCache.withLabels(summary, {"TICKER": ticker, "COUNTRY": country, "EXCHANGE": exchange}))
+
+    if not frames:
+        return pd.DataFrame(columns=summary_columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+# Keeps the topN rows by TRADED_VALUE within each (COUNTRY, YEAR)
+def _topPerGroup(df, topN):
+    df = df.sort_values(["COUNTRY", "YEAR", "TRADED_VALUE"], ascending=[True, True, False])
+    return df.groupby(["COUNTRY", "YEAR"], sort=False).head(topN).reset_index(drop=True)
+
+
+# Runs the whole pipeline and writes the ranking table to outPath.
+# index: optional subset of TickerSource.df (default: everything)
+def runRanking(topN=100, index=None, outPath=ranking_path, chunkSize=500, workers=None) -> pd.DataFrame:
+    if index is None:
+        index = TickerSource().df
+
+    allRows = list(zip(index["TICKER"], index["COUNTRY"], index["EXCHANGE"], index["FILEPATH"]))
+    chunks = [allRows[i:i + chunkSize] for i in range(0, len(allRows), chunkSize)]
+    print(f"Ranking {len(allRows)} symbols in {len(chunks)} chunks, top {topN} per country per year")
+
+    top = pd.DataFrame(columns=summary_columns)
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_summarizeChunk, chunk) for chunk in chunks]
+        for k, future in enumerate(as_completed(futures), start=1):
+            try:
+                summary = future.result()
+            except Exception as e:
+                print(f"[Warning] chunk failed: {e}")
+                continue
+
+            if not summary.empty:
+                merged = summary if top.empty else pd.concat([top, summary], ignore_index=True)
+                top = _topPerGroup(merged, topN)
+            print(f"[{k}/{len(chunks)}] chunks summarized, {time.time() - start:.0f}s elapsed")
+
+    top.insert(2, "RANK", top.groupby(["COUNTRY", "YEAR"]).cumcount() + 1)
+    top = top[["COUNTRY", "YEAR", "RANK", "TICKER", "EXCHANGE", "TRADED_VALUE", "NET_FLOW", "DAYS",
+               "FIRST_TRADE", "LAST_TRADE"]]
+
+    os.makedirs(os.path.dirname(outPath), exist_ok=True)
+    top.to_csv(outPath, index=False)
+    print(f"Done ranking, wrote {len(top)} rows to {outPath}")
+    return top
+
+
+if __name__ == "__main__":
+    runRanking()
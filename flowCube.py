@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import json
+import os
+import stooqCache
+import indicators
+import resample
+from fundamentalsStore import FundamentalsStore
+from tickerSource import TickerSource, relative_folderpath
+
+# "Where is the money flowing?" -- aggregated by country, exchange, sector and month.
+#
+# Cube cell = (COUNTRY, EXCHANGE, SECTOR, MONTH) -> TRADED_VALUE, NET_FLOW, SYMBOLS
+#   TRADED_VALUE = sum of typical price x volume
+#   NET_FLOW     = signed money flow (typical price up -> +, down -> -)
+#
+# Building it means scanning every symbol file, so it's done once and stored on disk:
+#   contrib.pkl  -- each symbol's monthly rows (so an update only recomputes symbols that changed)
+#   manifest.json -- filepath -> (mtime, size, sector) for every symbol in contrib.pkl
+#   cube.pkl     -- the full cube plus rollups over every subset of (COUNTRY, EXCHANGE, SECTOR)
+# Queries only ever touch cube.pkl, which is small (months x sectors x exchanges).
+#
+# Sectors come from the EODHD fundamentals we've already paid for (see fundamentalsStore),
+# so most symbols will be "Unknown" until their fundamentals get fetched.
+
+cube_folderpath = "data/cache/flowcube/"
+
+dimensions = ["COUNTRY", "EXCHANGE", "SECTOR"]
+measures = ["TRADED_VALUE", "NET_FLOW", "SYMBOLS"]
+
+# {(ticker, country): sector} from the local EODHD fundamentals store (stale entries still count,
+# a company's sector rarely changes)
+def loadSectors(store=None) -> dict:
+    if store is None:
+        store = FundamentalsStore()
+
+    table = store.fields_table().dropna(subset=["SECTOR"])
+    return dict(zip(zip(table["TICKER"], table["COUNTRY"]), table["SECTOR"]))
+
+
+# Monthly TRADED_VALUE / NET_FLOW rows for one daily series (arrays from stooqCache.loadArrays)
+def _symbolMonths(arr):
+    typical, raw, signed = indicators.moneyFlow(arr["HIGH"], arr["LOW"], arr["CLOSE"], arr["VOLUME"])
+    keys, starts = resample.periodRuns(arr["DATE"], "M")
+    return {
+        "MONTH": keys[starts].astype("datetime64[M]"),
+        "TRADED_VALUE": np.add.reduceat(raw, starts),
+        "NET_FLOW": np.add.reduceat(signed, starts),
+    }
+
+
+# rows = [(filepath, country, exchange, sector), ...]  (module-level so the process pool can pickle it)
+def _contribChunk(rows):
+    frames = []
+    for (filepath, country, exchange, sector), arr, meta in stooqCache.iterDailyArrays(rows, lambda r: r[0]):
+        df = pd.DataFrame(_symbolMonths(arr))
+        labels = {"FILEPATH": filepath, "COUNTRY": country, "EXCHANGE": exchange, "SECTOR": sector}
+        frames.append(stooqCache.withLabels(df, labels))
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+# Builds the cube, or updates it if one already exists: only symbols whose file changed
+# (mtime/size), whose sector changed, or that are new get rescanned; removed symbols are dropped.
+def updateCube(sectors=None, folder=cube_folderpath, chunkSize=500, workers=None):
+    src = TickerSource()
+    if sectors is None:
+        sectors = loadSectors()
+    src.setSectors(sectors)
+    index = src.df
+
+    os.makedirs(folder, exist_ok=True)
+    contribPath = os.path.join(folder, "contrib.pkl")
+    manifestPath = os.path.join(folder, "manifest.json")
+
+    contrib = None
+    manifest = {}
+    if os.path.exists(contribPath) and os.path.exists(manifestPath):
+        contrib = pd.read_pickle(contribPath)
+        with open(manifestPath, "r") as f:
+            manifest = json.load(f)
+
+    newManifest = {}
+    todo = []
+    for filepath, country, exchange, sector in zip(index["FILEPATH"], index["COUNTRY"], index["EXCHANGE"], index["SECTOR"]):
+        try:
+            stat = os.stat(f"{relative_folderpath}{filepath}")
+        except OSError:
+            continue
+        entry = [stat.st_mtime_ns, stat.st_size, sector]
+        newManifest[filepath] = entry
+        if manifest.get(filepath) != entry:
+            todo.append((filepath, country, exchange, sector))
+
+    print(f"Flow cube: {len(newManifest)} symbols, {len(todo)} to (re)scan")
+
+    # keep rows for symbols that are still there and didn't change
+    if contrib is not None:
+        redo = set(t[0] for t in todo)
+        contrib = contrib[contrib["FILEPATH"].isin(newManifest.keys()) & ~contrib["FILEPATH"].isin(redo)]
+
+    if todo:
+        chunks = [todo[i:i + chunkSize] for i in range(0, len(todo), chunkSize)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = [p for p in pool.map(_contribChunk, chunks) if p is not None]
+        if contrib is not None:
+            parts.insert(0, contrib)
+        if parts:
+            contrib = pd.concat(parts, ignore_index=True)
+
+    if contrib is None:
+        print("[Warning] no symbol data found, flow cube not written")
+        return None
+
+    contrib.to_pickle(contribPath + ".tmp")
+    os.replace(contribPath + ".tmp", contribPath)
+    with open(manifestPath, "w") as f:
+        json.dump(newManifest, f)
+
+    cube = _buildRollups(contrib)
+    pd.to_pickle(cube, os.path.join(folder, "cube.pkl.tmp"))
+    os.replace(os.path.join(folder, "cube.pkl.tmp"), os.path.join(folder, "cube.pkl"))
+    print(f"Done updating flow cube in {folder}")
+    return folder
+
+
+# The full cube plus one rollup per subset of the dimensions (always by MONTH too).
+# Returns {tuple of dimensions: DataFrame}
+def _buildRollups(contrib):
+    rollups = {}
+    for n in range(len(dimensions), -1, -1):
+        for dims in combinations(dimensions, n):
+            keys = list(dims) + ["MONTH"]
+            rolled = contrib.groupby(keys, sort=True).agg(
+                TRADED_VALUE=("TRADED_VALUE", "sum"),
+                NET_FLOW=("NET_FLOW", "sum"),
+                SYMBOLS=("FILEPATH", "nunique"),
+            ).reset_index()
+            rollups[dims] = rolled
+    return rollups
+
+
+# Read side. Loads cube.pkl once, then every query is a filter on the smallest rollup that has
+# the dimensions it needs.
+class FlowCube:
+    def __init__(self, folder=cube_folderpath):
+        self.rollups = pd.read_pickle(os.path.join(folder, "cube.pkl"))
+
+    # by:      dimensions to break the result down by, e.g. ["SECTOR"] or ["COUNTRY", "SECTOR"]
+    # country / exchange / sector: optional filters (a value or a list of values)
+    # start / end: optional month range (anything pandas can turn into a date)
+    # Returns one row per (by..., MONTH) with TRADED_VALUE, NET_FLOW, SYMBOLS
+    def query(self, by=("SECTOR",), country=None, exchange=None, sector=None, start=None, end=None) -> pd.DataFrame:
+        filters = {"COUNTRY": country, "EXCHANGE": exchange, "SECTOR": sector}
+        needed = set(by) | {dim for dim, value in filters.items() if value is not None}
+        dims = tuple(d for d in dimensions if d in needed)
+        df = self.rollups[dims]
+
+        mask = np.ones(len(df), dtype=bool)
+        for dim, value in filters.items():
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            mask &= df[dim].isin(values).to_numpy()
+        if start is not None:
+            mask &= (df["MONTH"] >= pd.Timestamp(start).to_period("M").to_timestamp()).to_numpy()
+        if end is not None:
+            mask &= (df["MONTH"] <= pd.Timestamp(end)).to_numpy()
+        df = df[mask]
+
+        # Filtering on a dimension we don't group by still needs it summed away.
+        # (every symbol sits in exactly one country/exchange/sector, so summing SYMBOLS still counts each once)
+        keys = [d for d in dimensions if d in by] + ["MONTH"]
+        if len(keys) - 1 < len(dims):
+            df = df.groupby(keys, sort=True)[measures].sum().reset_index()
+        return df.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    updateCube()
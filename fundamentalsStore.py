@@ -0,0 +1,183 @@
+import os
+import json
+import pandas as pd
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+# EODHD exchange suffix -> stooq country folder, so fundamentals line up with TickerSource.df
+eodhd_countries = {
+    "US": "us", "LSE": "uk", "XETRA": "de", "F": "de", "BE": "de", "STU": "de",
+    "TSE": "jp", "HK": "hk", "BUD": "hu", "WAR": "pl",
+}
+
+
+def symbol_to_key(symbol):
+    """
+    Split an EODHD symbol into the (TICKER, COUNTRY) pair TickerSource.df uses.
+
+    Args:
+        symbol (str): EODHD symbol (e.g. "NVDA.US", "VOD.LSE")
+
+    Returns:
+        tuple: (ticker, country), e.g. ("nvda", "us")
+    """
+    ticker, _, exchange = symbol.rpartition(".")
+    return ticker.lower(), eodhd_countries.get(exchange.upper(), exchange.lower())
+
+
+class FundamentalsStore:
+    """
+    On-disk store of EODHD fundamentals responses, one JSON file per symbol.
+
+    Each file holds the symbol, when it was fetched and the full response, so a
+    ticker we've already paid for is never fetched again until it goes stale.
+    """
+
+    def __init__(self, folder='data/fundamentals/', max_age_days=90):
+        """
+        Initialize the store.
+
+        Args:
+            folder (str): Where the per-symbol JSON files live
+            max_age_days (float): Default age after which an entry counts as stale
+                (fundamentals mostly change once a quarter)
+        """
+        self._folder = Path(folder)
+        self._max_age_days = max_age_days
+        self._folder.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, symbol):
+        return self._folder / f"{symbol.upper().replace(os.sep, '_')}.json"
+
+    def get_entry(self, symbol):
+        """
+        Return the stored entry ({'symbol', 'fetched_at', 'response'}), or None.
+        """
+        try:
+            with open(self._path(symbol), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, symbol, max_age_days=None):
+        """
+        Return the stored response if there is one and it's fresh enough.
+
+        Args:
+            symbol (str): EODHD symbol (e.g. "NVDA.US")
+            max_age_days (float): Override the store's staleness policy (None = store default)
+
+        Returns:
+            dict: The response, or None if missing or stale
+        """
+        entry = self.get_entry(symbol)
+        if entry is None or self.is_stale(entry, max_age_days):
+            return None
+        return entry['response']
+
+    def is_stale(self, entry, max_age_days=None):
+        """Whether a stored entry is older than max_age_days (None = store default)."""
+        max_age = self._max_age_days if max_age_days is None else max_age_days
+        if max_age is None:
+            return False
+        fetched = datetime.fromisoformat(entry['fetched_at'])
+        return datetime.now() - fetched > timedelta(days=max_age)
+
+    def put(self, symbol, response, fetched_at=None):
+        """
+        Store a response (temp file + rename, so readers never see half of it).
+
+        Args:
+            symbol (str): EODHD symbol (e.g. "NVDA.US")
+            response (dict): The fundamentals response
+            fetched_at (str): ISO timestamp of the fetch (default: now)
+        """
+        entry = {
+            'symbol': symbol.upper(),
+            'fetched_at': fetched_at or datetime.now().isoformat(),
+            'response': response,
+        }
+        path = self._path(symbol)
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+    def symbols(self):
+        """Every symbol in the store."""
+        return sorted(p.stem for p in self._folder.glob('*.json'))
+
+    def __contains__(self, symbol):
+        return self._path(symbol).exists()
+
+    def __len__(self):
+        return sum(1 for _ in self._folder.glob('*.json'))
+
+    def entries(self, symbols=None):
+        """Yield stored entries for symbols (default: every symbol in the store)."""
+        for symbol in (self.symbols() if symbols is None else symbols):
+            entry = self.get_entry(symbol)
+            if entry is not None:
+                yield entry
+
+    def fields_table(self, symbols=None):
+        """
+        Extract the commonly used fields into one row per symbol.
+
+        TICKER and COUNTRY use the same form as TickerSource.df (e.g. "nvda", "us"),
+        so the result can be merged straight onto it.
+
+        Args:
+            symbols (list): EODHD symbols to include (default: everything stored)
+
+        Returns:
+            pd.DataFrame: SYMBOL, TICKER, COUNTRY, SECTOR, INDUSTRY, SHARES_OUTSTANDING, FETCHED_AT
+        """
+        rows = []
+        for entry in self.entries(symbols):
+            response = entry['response'] or {}
+            general = response.get('General') or {}
+            shares = (response.get('SharesStats') or {}).get('SharesOutstanding')
+            ticker, country = symbol_to_key(entry['symbol'])
+            rows.append({
+                'SYMBOL': entry['symbol'],
+                'TICKER': ticker,
+                'COUNTRY': country,
+                'SECTOR': general.get('Sector') or None,
+                'INDUSTRY': general.get('Industry') or None,
+                'SHARES_OUTSTANDING': float(shares) if shares not in (None, '') else None,
+                'FETCHED_AT': pd.Timestamp(entry['fetched_at']),
+            })
+        columns = ['SYMBOL', 'TICKER', 'COUNTRY', 'SECTOR', 'INDUSTRY', 'SHARES_OUTSTANDING', 'FETCHED_AT']
+        return pd.DataFrame(rows, columns=columns)
+
+    def shares_history(self, symbols=None, period='quarterly'):
+        """
+        Shares outstanding over time, one row per (symbol, date).
+
+        Args:
+            symbols (list): EODHD symbols to include (default: everything stored)
+            period (str): 'quarterly' or 'annual'
+
+        Returns:
+            pd.DataFrame: SYMBOL, TICKER, COUNTRY, DATE, SHARES, sorted by symbol then DATE
+        """
+        rows = []
+        for entry in self.entries(symbols):
+            history = ((entry['response'] or {}).get('outstandingShares') or {}).get(period) or {}
+            ticker, country = symbol_to_key(entry['symbol'])
+            for point in history.values():
+                date = point.get('dateFormatted') or point.get('date')
+                shares = point.get('shares')
+                if not date or shares in (None, ''):
+                    continue
+                rows.append({
+                    'SYMBOL': entry['symbol'],
+                    'TICKER': ticker,
+                    'COUNTRY': country,
+                    'DATE': pd.Timestamp(date),
+                    'SHARES': float(shares),
+                })
+        df = pd.DataFrame(rows, columns=['SYMBOL', 'TICKER', 'COUNTRY', 'DATE', 'SHARES'])
+        return df.sort_values(['SYMBOL', 'DATE']).reset_index(drop=True)
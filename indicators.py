@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# Volume-based indicators from notes.txt, computed on whole arrays at once:
+#
+#   Typical Price = (High + Low + Close) / 3
+#   Money Flow    = Typical Price x Volume, signed by whether the typical price rose or fell
+#   OBV           = running sum of +Volume (close up), -Volume (close down), 0 (unchanged)
+#   CLV           = ((Close - Low) - (High - Close)) / (High - Low)
+#   A/D           = running sum of CLV x Volume
+#
+# Everything here that depends on the previous bar takes that previous bar's values as arguments
+# (prevClose, prevTypical, prevOBV, prevAD). That's what makes the incremental mode work:
+# IndicatorState remembers the last bar, and extend() only runs on the new bars.
+
+indicator_columns = ["DATE", "TYPICAL", "MONEY_FLOW", "SIGNED_FLOW", "OBV_DELTA", "OBV", "CLV", "AD"]
+
+
+def typicalPrice(high, low, close):
+    return (np.asarray(high, dtype="f8") + np.asarray(low, dtype="f8") + np.asarray(close, dtype="f8")) / 3.0
+
+
+# Sign of each bar's change vs. the bar before it (the first bar compares against prev).
+# A NaN prev (no previous bar) counts as "unchanged".
+def _direction(values, prev=np.nan):
+    values = np.asarray(values, dtype="f8")
+    previous = np.empty_like(values)
+    if len(values) > 0:
+        previous[0] = prev
+        previous[1:] = values[:-1]
+    return np.nan_to_num(np.sign(values - previous))
+
+
+# Returns (per-bar OBV change, running OBV)
+def onBalanceVolume(close, volume, prevClose=np.nan, prevOBV=0.0):
+    delta = _direction(close, prevClose) * np.asarray(volume, dtype="f8")
+    return delta, prevOBV + np.cumsum(delta)
+
+
+def closeLocationValue(high, low, close):
+    high = np.asarray(high, dtype="f8")
+    low = np.asarray(low, dtype="f8")
+    close = np.asarray(close, dtype="f8")
+    span = high - low
+    # A bar with high == low has no range to locate the close in, so it counts as 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        clv = np.where(span > 0, ((close - low) - (high - close)) / span, 0.0)
+    return clv
+
+
+# Returns (CLV, running A/D line)
+def accumulationDistribution(high, low, close, volume, prevAD=0.0):
+    clv = closeLocationValue(high, low, close)
+    return clv, prevAD + np.cumsum(clv * np.asarray(volume, dtype="f8"))
+
+
+# Returns (typical price, raw money flow, signed money flow)
+def moneyFlow(high, low, close, volume, prevTypical=np.nan):
+    typical = typicalPrice(high, low, close)
+    raw = typical * np.asarray(volume, dtype="f8")
+    return typical, raw, _direction(typical, prevTypical) * raw
+
+
+# Everything needed to continue the indicators from the last bar we've seen
+class IndicatorState:
+    def __init__(self):
+        self.lastDate = None
+        self.lastClose = np.nan
+        self.lastTypical = np.nan
+        self.obv = 0.0
+        self.ad = 0.0
+        self.bars = 0
+
+    def __repr__(self):
+        return (f"IndicatorState(lastDate={self.lastDate}, bars={self.bars}, "
+                f"obv={self.obv:g}, ad={self.ad:g})")
+
+    # Computes the indicators for df (sorted by DATE, continuing right after the last bar seen)
+    # and advances the state. Returns a DataFrame with indicator_columns.
+    def extend(self, df) -> pd.DataFrame:
+        if len(df) == 0:
+            return pd.DataFrame({col: pd.Series(dtype="f8") for col in indicator_columns})
+
+        high, low, close, volume = df["HIGH"], df["LOW"], df["CLOSE"], df["VOLUME"]
+
+        typical, raw, signed = moneyFlow(high, low, close, volume, self.lastTypical)
+        obvDelta, obv = onBalanceVolume(close, volume, self.lastClose, self.obv)
+        clv, ad = accumulationDistribution(high, low, close, volume, self.ad)
+
+        out = pd.DataFrame({
+            "DATE": df["DATE"].to_numpy(),
+            "TYPICAL": typical,
+            "MONEY_FLOW": raw,
+            "SIGNED_FLOW": signed,
+            "OBV_DELTA": obvDelta,
+            "OBV": obv,
+            "CLV": clv,
+            "AD": ad,
+        })
+
+        self.lastDate = df["DATE"].iloc[-1]
+        self.lastClose = float(close.iloc[-1])
+        self.lastTypical = float(typical[-1])
+        self.obv = float(obv[-1])
+        self.ad = float(ad[-1])
+        self.bars += len(df)
+        return out
+
+
+# One-shot version: indicators for a whole frame, starting from zero
+def computeIndicators(df) -> pd.DataFrame:
+    return IndicatorState().extend(df)
@@ -0,0 +1,78 @@
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+# A sorted set of closed intervals [start, end] that merges on insert.
+# Used by Stonk to remember which date ranges it already has in memory.
+#
+# The intervals never overlap and are kept sorted, in two parallel lists (starts / ends),
+# so "is [a, b] already covered?" is one bisect instead of a loop over every saved range.
+#
+# step is the resolution of the values: two intervals that are only `step` apart get merged,
+# e.g. with step = 1 second, [Jan 1 00:00:00, Jan 1 23:59:59] and [Jan 2 00:00:00, ...] become one.
+# It's also what gets added/subtracted to report the gaps in missing().
+
+class IntervalSet:
+    def __init__(self, step=timedelta(seconds=1)):
+        self.step = step
+        self.starts = []
+        self.ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends))
+
+    def __repr__(self):
+        return f"IntervalSet({list(self)})"
+
+    def clear(self):
+        self.starts = []
+        self.ends = []
+
+    # Adds [lo, hi], merging with every interval it overlaps or touches
+    def add(self, lo, hi):
+        if lo > hi:
+            lo, hi = hi, lo
+
+        # first interval that ends at/after lo (or touches it)
+        i = bisect_left(self.ends, lo - self.step)
+        # one past the last interval that starts at/before hi (or touches it)
+        j = bisect_right(self.starts, hi + self.step)
+
+        if i < j:
+            lo = min(lo, self.starts[i])
+            hi = max(hi, self.ends[j - 1])
+
+        self.starts[i:j] = [lo]
+        self.ends[i:j] = [hi]
+
+    # True if [lo, hi] is entirely covered by one (merged) interval
+    def contains(self, lo, hi):
+        if lo > hi:
+            lo, hi = hi, lo
+
+        i = bisect_right(self.starts, lo) - 1
+        return i >= 0 and self.ends[i] >= hi
+
+    # Returns the pieces of [lo, hi] that are NOT covered, as a sorted list of (start, end)
+    def missing(self, lo, hi):
+        if lo > hi:
+            lo, hi = hi, lo
+
+        gaps = []
+        cursor = lo
+        i = max(bisect_right(self.starts, lo) - 1, 0)
+        while i < len(self.starts) and self.starts[i] <= hi:
+            start, end = self.starts[i], self.ends[i]
+            if end >= cursor:
+                if start > cursor:
+                    gaps.append((cursor, start - self.step))
+                cursor = end + self.step
+                if cursor > hi:
+                    return gaps
+            i += 1
+
+        if cursor <= hi:
+            gaps.append((cursor, hi))
+        return gaps
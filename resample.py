@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+# Builds weekly / monthly / quarterly / yearly OHLCV bars out of daily bars:
+#   OPEN = first open, HIGH = max high, LOW = min low, CLOSE = last close, VOLUME = summed volume
+#   DATE = the last trading day in the period (same as Stooq's own monthly files)
+#
+# The daily frame is already sorted by DATE, so every period is one contiguous run of rows.
+# That means no groupby: find where the period changes, then use NumPy's reduceat on each run.
+
+# freq -> what PER gets set to on the output (Stooq uses "D" and "M", the rest follow the same idea)
+freqs = {"W": "W", "M": "M", "Q": "Q", "Y": "Y"}
+
+
+# One integer per row that's the same for every day in the same period
+def _periodKeys(dates, freq):
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    if freq == "W":
+        # 1970-01-01 was a Thursday, so shifting by 3 days makes weeks run Monday -> Sunday
+        return (dates.astype("i8") + 3) // 7
+    if freq == "M":
+        return dates.astype("datetime64[M]").astype("i8")
+    if freq == "Q":
+        return dates.astype("datetime64[M]").astype("i8") // 3
+    if freq == "Y":
+        return dates.astype("datetime64[Y]").astype("i8")
+    raise ValueError(f"freq should be one of {list(freqs)}, but is {freq}")
+
+
+# Sorted dates -> (period key per row, index of the first row of each period).
+# Every period is one contiguous run, so the starts are all np.add.reduceat & co. need.
+def periodRuns(dates, freq):
+    keys = _periodKeys(dates, freq)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys, starts
+
+
+# df: daily bars sorted by DATE, with DATE/OPEN/HIGH/LOW/CLOSE/VOLUME columns
+def resampleOHLCV(df, freq="M") -> pd.DataFrame:
+    if len(df) == 0:
+        return pd.DataFrame(columns=["DATE", "OPEN", "HIGH", "LOW", "CLOSE", "VOLUME", "PER"])
+
+    keys, starts = periodRuns(df["DATE"].to_numpy(), freq)
+    ends = np.r_[starts[1:], len(keys)] - 1
+
+    out = pd.DataFrame({
+        "DATE": df["DATE"].to_numpy()[ends],
+        "OPEN": df["OPEN"].to_numpy(dtype="f8")[starts],
+        "HIGH": np.maximum.reduceat(df["HIGH"].to_numpy(dtype="f8"), starts),
+        "LOW": np.minimum.reduceat(df["LOW"].to_numpy(dtype="f8"), starts),
+        "CLOSE": df["CLOSE"].to_numpy(dtype="f8")[ends],
+        "VOLUME": np.add.reduceat(df["VOLUME"].to_numpy(dtype="f8"), starts),
+    })
+    out["PER"] = freqs[freq]
+    return out
@@ -1,35 +1,61 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 import os
 from tickerSource import TickerSource
+import stooqCache
+from intervalSet import IntervalSet
+import trailingStop
+import indicators
+import resample
+import stooqClient
 
 # Set to "True" for testing flags / printouts, otherwise "False"
 TEST = True
 
+# A symbol whose local file stops trading this long before the file's last update looks delisted.
+# The API gets asked once (a halted stock might have resumed trading); if that comes back empty,
+# anything after its last trade is known to be empty and we stop asking. See _deadState()
+DEAD_AFTER = timedelta(days=30)
+
 
 # Time to encapsulate some stock knowledge
 # This Stonk is a single stock. It only has one symbol. 
 
 class Stonk:
-    def __init__(self, ticker = "NVDA", country = "US"):
+    # exchange is only needed when the same ticker is listed on more than one exchange in a country
+    def __init__(self, ticker = "NVDA", country = "US", exchange = None):
         # Stores the name of the stock. The Stooq library uses country codes like "NVDA.US" in the function call.
         self.ticker = ticker.upper()
         self.country = country.upper()
         self.symb = f"{ticker.upper()}.{country.upper()}"
         # Creates a blank dataframe for keeping stock data
         # They're actually stored in all UPPERCASE casing.
-        self.day_df = pd.DataFrame(columns=["Date", "Open", "High", "Low", "Close", "Volume"])               
-        self.month_df = pd.DataFrame(columns=["Date", "Open", "High", "Low", "Close", "Volume"])
-        self.day_df.columns = self.day_df.columns.str.upper()
-        self.month_df.columns = self.day_df.columns.str.upper()
-        self.day_df["PER"] = "D"
-        self.month_df["PER"] = "M"
+        # The columns are typed up front, so DATE stays a real datetime column after appending
+        # (with untyped empty columns everything turned into "object" and searchsorted couldn't be used)
+        # They use the compact schema from stooqCache (float32 prices, categorical PER, no TICKER/TIME/OPENINT
+        # repeated on every row), and everything appended gets converted to it. See memoryUsage()
+        self.day_df = Stonk._emptyFrame()
+        self.month_df = Stonk._emptyFrame()
+
+        # Date ranges we already hold in day_df / month_df.
+        # IntervalSet keeps them sorted and merged, so adjacent or overlapping loads collapse into one range.
+        self.savedDayRanges = IntervalSet()
+        self.savedMonthRanges = IntervalSet()
+
+        # Daily indicators (OBV, A/D, money flow) lined up with day_df, plus the state to extend them.
+        # See getIndicatorsDaily()
+        self._dayIndicators = None
+        self._dayIndicatorState = None
 
-        self.savedDayRanges = []
-        self.savedMonthRanges = []
+        # freq ("W", "M", "Q", "Y") -> bars aggregated from the local daily file. See getResampled()
+        self._resampled = {}
+
+        # None until a symbol that looks delisted has been checked with the API once (see _deadState)
+        self._stillTrading = None
 
         self.tsrc = TickerSource()
-        self.filepath = self.tsrc.getPath(ticker, country, True)
+        self.filepath = self.tsrc.getPath(ticker, country, True, exchange)
         print(f"Initializing path for {self.symb}: '{self.filepath}'")
 
 
@@ -39,23 +65,15 @@ class Stonk:
     # Returns a df of the entire stock at the given filepath
     def fromFile(self, filepath, saveToLocal = False):
         try:
-            df = pd.read_csv(filepath)
+            # Goes through the binary cache (see stooqCache.py), so the csv is only parsed
+            # the first time we see this file (or after it changes on disk).
+            df = stooqCache.loadFrame(filepath, compact=True)
             print(f"Constructing from file {filepath}")
-            # print(df.head(10))
-            df.columns = df.columns.str.strip("<>").str.upper()
-            # print(f"Printing at {filepath} post-strip")
-            # print(df.head(10))
-
-            # Formatting correctly
-            df["DATE"] = pd.to_datetime(df["DATE"], format="%Y%m%d")
-            for col in ["OPEN", "HIGH", "LOW", "CLOSE", "VOL", "OPENINT"]:
-                df[col] = pd.to_numeric(df[col])
-
-            df = df.rename(columns={"VOL": "VOLUME"})
 
             if df.size > 0:
                 # Constructing object now:
-                ticker = df.iloc[0]["TICKER"]
+                # (the compact frame has no TICKER column -- it's the same on every row, and it's us)
+                ticker = self.symb
                 # print("Ticker:")
                 # print(ticker)
                 # print(f"Type: {type(ticker)}")
@@ -64,12 +82,11 @@ class Stonk:
                 # Dumps the stock if it's not daily or monthly trade info
                 per = df.iloc[0]["PER"]
                 if saveToLocal:
+                    # (the append functions record the saved range themselves)
                     if per == "D":
                         self._append_day_df(df)
-                        self.savedDayRanges.append(df["DATE"].min(), df["DATE"].max())
                     elif per == "M":
                         self._append_month_df(df)
-                        self.savedMonthRanges.append(df["DATE"].min(), df["DATE"].max())
                     else:
                         print(f"[Warning] stock data at {filepath} is not defind as Daily nor Monthly. Dumping {ticker}")
                         return None
@@ -85,6 +102,34 @@ class Stonk:
 
     
 
+    @staticmethod
+    def _emptyFrame():
+        return pd.DataFrame({
+            "DATE": pd.Series(dtype="datetime64[ns]"),
+            "OPEN": pd.Series(dtype="float32"),
+            "HIGH": pd.Series(dtype="float32"),
+            "LOW": pd.Series(dtype="float32"),
+            "CLOSE": pd.Series(dtype="float32"),
+            "VOLUME": pd.Series(dtype="int64"),
+            "PER": pd.Series(dtype=stooqCache.per_dtype),
+        })
+
+    # How much memory the stored bars take.
+    # Returns {"dayBars", "dayBytes", "monthBars", "monthBytes", "bytesPerBar"}
+    def memoryUsage(self) -> dict:
+        day = self.day_df
+        month = self.month_df
+        dayBytes = int(day.memory_usage(index=True, deep=True).sum())
+        monthBytes = int(month.memory_usage(index=True, deep=True).sum())
+        bars = len(day) + len(month)
+        return {
+            "dayBars": len(day),
+            "dayBytes": dayBytes,
+            "monthBars": len(month),
+            "monthBytes": monthBytes,
+            "bytesPerBar": (dayBytes + monthBytes) / bars if bars else 0.0,
+        }
+
     def print(self):
         print(f"Printing daily trades for stock {self.symb}")
         print(self.day_df)
@@ -96,6 +141,52 @@ class Stonk:
 
     ### Saving data:
 
+    # day_df / month_df are properties so appends can be lazy:
+    # _append_day_df just drops the new chunk in a pending list (O(1)), and the chunks get merged
+    # into the real frame the next time someone actually reads day_df.
+    # Calling setDayTradeRange hundreds of times in a row used to concat + sort + dedup the whole
+    # frame on every call (quadratic). Now it's one merge per read, however many chunks piled up.
+    @property
+    def day_df(self):
+        if self._day_pending:
+            self._day_df = Stonk._mergeSorted(self._day_df, self._day_pending)
+            self._day_pending = []
+        return self._day_df
+
+    @day_df.setter
+    def day_df(self, df):
+        self._day_df = df
+        self._day_pending = []
+
+    @property
+    def month_df(self):
+        if self._month_pending:
+            self._month_df = Stonk._mergeSorted(self._month_df, self._month_pending)
+            self._month_pending = []
+        return self._month_df
+
+    @month_df.setter
+    def month_df(self, df):
+        self._month_df = df
+        self._month_pending = []
+
+    # Merges already-sorted chunks into an already-sorted frame, dropping duplicate DATEs.
+    # Everything is in the compact schema by now, and concat keeps float32 / the shared PER categories.
+    # The stable sort is near-linear on pre-sorted runs, and the first occurrence of a DATE wins,
+    # so bars already in the frame are kept over newly appended ones (same as before).
+    @staticmethod
+    def _mergeSorted(base, chunks):
+        df = pd.concat([base] + chunks, ignore_index=True)
+        df = df.sort_values(by="DATE", kind="stable", ignore_index=True)
+
+        # Sorted, so duplicates are always neighbours -- no hashing needed
+        dates = df["DATE"].to_numpy()
+        keep = np.ones(len(df), dtype=bool)
+        keep[1:] = dates[1:] != dates[:-1]
+        if keep.all():
+            return df
+        return df[keep].reset_index(drop=True)
+
     def _sort_day_df(self):
         self.day_df = self.day_df.sort_values(by="DATE", ascending=True).reset_index(drop=True)
 
@@ -103,17 +194,27 @@ class Stonk:
         self.month_df = self.month_df.sort_values(by="DATE", ascending=True).reset_index(drop=True)
 
     
-    # Appends the df to month data, sorts it, and updates ranges
-    def _append_day_df(self, dfin):
+    # The range a df covers, as (first day 00:00:00, last day 23:59:59).
+    # If the caller knows the window it asked for (day1, day2), that's used instead, because
+    # it also covers the non-trading days at the edges (weekends, holidays).
+    def _coverage(self, dfin, day1=None, day2=None):
+        if day1 is not None and day2 is not None:
+            return day1, day2
+        earliestDate = dfin["DATE"].min().to_pydatetime()
+        latestDate = dfin["DATE"].max().to_pydatetime()
+        return earliestDate.replace(hour=0, minute=0, second=0), latestDate.replace(hour=23, minute=59, second=59)
+
+    # Appends the df to day data, sorts it, and updates ranges
+    def _append_day_df(self, dfin, day1=None, day2=None):
         try:
-            self.day_df = pd.concat([self.day_df, dfin], ignore_index=True)
-            self._sort_day_df()
-            # Drop duplicates by DATE, keeping the first occurrence
-            self.day_df = self.day_df.drop_duplicates(subset="DATE", keep="first")
+            # Nothing to save (e.g. a failed API call). Don't mark the range as saved either.
+            if dfin.empty:
+                return
+
+            # Merged (sorted, deduped by DATE) lazily, on the next read of self.day_df
+            self._day_pending.append(stooqCache.compactFrame(dfin, "D"))
 
-            earliestDate = dfin["DATE"].min()
-            latestDate = dfin["DATE"].max()
-            self.savedDayRanges.append((earliestDate, latestDate))
+            self.savedDayRanges.add(*self._coverage(dfin, day1, day2))
 
             # print(f"Saved date range: {self.savedDayRanges}")
 
@@ -122,16 +223,14 @@ class Stonk:
 
 
     # Appends the df to month data, sorts it, and updates ranges
-    def _append_month_df(self, dfin):
+    def _append_month_df(self, dfin, day1=None, day2=None):
         try:
-            self.month_df = pd.concat([self.month_df, dfin], ignore_index=True)
-            self._sort_month_df()
-            # Drop duplicates by DATE, keeping the first occurrence
-            self.month_df = self.month_df.drop_duplicates(subset="DATE", keep="first")
+            if dfin.empty:
+                return
 
-            earliestDate = dfin["DATE"].min()
-            latestDate = dfin["DATE"].max()
-            self.savedMonthRanges.append((earliestDate, latestDate))
+            self._month_pending.append(stooqCache.compactFrame(dfin, "M"))
+
+            self.savedMonthRanges.add(*self._coverage(dfin, day1, day2))
 
             # print(f"Saved date range: {self.savedDayRanges}")
 
@@ -144,20 +243,21 @@ class Stonk:
         if day1 > day2: # swap the values to ensure day1 is less than day2
             day1, day2 = day2, day1 
 
-        isInRange = False
         if per == "M":
-            for start, end in self.savedMonthRanges:
-                if day1 >= start and day2 <= end:
-                    isInRange = True
+            isInRange = self.savedMonthRanges.contains(day1, day2)
         else:
-            for start, end in self.savedDayRanges:
-                if day1 >= start and day2 <= end:
-                    isInRange = True
+            isInRange = self.savedDayRanges.contains(day1, day2)
 
         # print(f"Range {day1}, {day2} is within this object's scope of {self.savedDayRanges} ? \n {isInRange}")
         
         return isInRange
 
+    # Returns the sub-ranges of [day1, day2] that are NOT stored in this object yet, as [(start, end), ...]
+    def missingRanges(self, day1, day2, per="D"):
+        if per == "M":
+            return self.savedMonthRanges.missing(day1, day2)
+        return self.savedDayRanges.missing(day1, day2)
+
 
     
     # Stock market is not always open.
@@ -165,18 +265,33 @@ class Stonk:
     # it basically casts a range from that day, forwards one week, and picks the earliest one available.
     # Limitation: Only works for past dates
     # Will break if a stock holiday exceeds 3 weeks.
+    # Returns None if there's no trading day in the next 3 weeks.
     def nextTradingDay(self, day:datetime):
-        df = self.getDayTradeRange(day, day + timedelta(days=7), False)
-        if df == pd.DataFrame():
-            # Expands the search to 3 weeks in case a stock holiday exceeds 1 week
-            df = self.getDayTradeRange(day, day + timedelta(days=21), False)
-        date = df.iloc[0]["DATE"]
-        date = date.to_pydatetime()
+        day = day.replace(hour=0, minute=0, second=0)
+        df = pd.DataFrame()
+        date = None
+        # Expands the search to 3 weeks in case a stock holiday exceeds 1 week
+        for span in [7, 21]:
+            end = day + timedelta(days=span, hours=23, minutes=59, seconds=59)
+            if self.inRange(day, end):
+                # Already in memory -- just binary search day_df, no slicing needed
+                df = self.day_df
+            else:
+                df = self.getDayTradeRange(day, end, False)
+            if df.empty:
+                continue
+
+            i = df["DATE"].searchsorted(day, side="left")
+            if i < len(df) and df["DATE"].iloc[i] <= end:
+                date = df["DATE"].iloc[i].to_pydatetime()
+                break
+
+        if date is None:
+            print(f"[Warning] no trading day found for {self.symb} within 3 weeks of {day:%Y-%m-%d}")
+            return None
         if TEST:
             print(f"nextTradingDay date type: {type(date)}")
             print(f"nextTradingDay date: {date}")
-            print("-------")
-            print(f"Entire df: {df}")
         return date
 
 
@@ -186,33 +301,26 @@ class Stonk:
     # M for monthly data
     # Function assumes day2 is later than day1 and both days are in the past.
     def getAPICall(self, day1:datetime, day2:datetime, division="D"):
-        url = "dummyURL"
-
         # data validation
         if division != "D" and division != "M":
             print(f"[Warning] division is invalid in API call. Should be D or M, but is {division}")
+            return pd.DataFrame()
 
+        # Goes through the shared StooqClient: pooled connections, timeout, retries with backoff,
+        # and rate limiting shared with every other Stonk in this process.
+        # It returns an empty frame instead of None when the download fails.
+        client = stooqClient.getDefaultClient()
+        if TEST:
+            print(f"[API] {client.buildUrl(self.symb, day1, day2, division.lower())}")
+        df = client.fetch(self.symb, day1, day2, division.lower())
+        # same compact schema as the local files, so pieces from both concat cleanly
+        return df if df.empty else stooqCache.compactFrame(df, division)
 
-        try:
-            if division == "D":
-                url = f"https://stooq.com/q/d/l/?s={self.symb}&d1={day1:%Y%m%d}&d2={day2:%Y%m%d}&i=d"
-            elif division == "M":
-                url = f"https://stooq.com/q/d/l/?s={self.symb}&d1={day1:%Y%m%d}&d2={day2:%Y%m%d}&i=m"
-
-            df = (pd.read_csv(url, parse_dates=["Date"])
-                    .sort_values("Date"))
-            df.reset_index(drop=True)
-
-            # switch to upper
-            # add PER
-            df.columns = df.columns.str.upper()
-            df["PER"] = division #D for day, #M for month
-            
-            return df
-            
-        except Exception as e:
-            print(f"[Warning] Failed to fetch {self.symb} for {day1:%Y-%m-%d} to {day2:%Y-%m-%d} from url: {url}:\nerror: {e}")
-            return pd.DataFrame()  # return an empty frame instead of None
+    # Downloads many symbols at once (concurrently, through the shared StooqClient).
+    # Returns {"NVDA.US": DataFrame, ...}
+    @staticmethod
+    def getAPICallMany(symbols, day1:datetime, day2:datetime, division="D"):
+        return stooqClient.getDefaultClient().fetchMany(symbols, day1, day2, division.lower())
 
 
 
@@ -282,35 +390,155 @@ class Stonk:
         day1 = day1.replace(hour=0, minute=0, second=0)
         day2 = day2.replace(hour=23, minute=59, second=59)
 
-        # initialize empty
-        df = pd.DataFrame()
-
-        # Returns local data if it's already saved
-        if self.inRange(day1, day2):
-            # df = self.day_df[(self.day_df["DATE"] <= day2 and self.day_df["DATE"] >= day1)]
-            # from gpt: "Ah — good instinct! You’re super close — but there’s a subtle pandas gotcha here.
-            # You can’t use plain Python and or or inside a pandas filter, because those work on single boolean values, not arrays of booleans.""
-            df = self.day_df[(self.day_df["DATE"] <= day2) & (self.day_df["DATE"] >= day1)]
-            # print(f"Results from branch 1 : ")
-        elif day2 <= self.tsrc.lastUpdated():
-            # get the whole thing from downloaded files, then slice it
-            df_full = self.fromFile(self.filepath)
-            df = df_full[(df_full["DATE"] <= day2) & (df_full["DATE"] >= day1)]
-            # print(f"Results from branch 2 : ")
-        else:
-            # fall back to API call
-            df = self.getAPICall(day1, day2, "D")
-            # print(f"Results from branch 3 : ")
-        
-        if save: self._append_day_df(df)
-        
-        return df     
+        # Splits the request into what we already have, what's in the local file, and what needs the API,
+        # then only fetches the missing pieces.
+        plan = self._planDayFetch(day1, day2)
+        if TEST:
+            print(f"getDayTradeRange plan for {self.symb}: {[(src, f'{a:%Y-%m-%d}', f'{b:%Y-%m-%d}') for src, a, b in plan]}")
+
+        pieces = []
+        df_full = None
+        for source, start, end in plan:
+            piece = None
+            if source == "memory":
+                # Returns local data if it's already saved
+                pieces.append(self._sliceDays(self.day_df, start, end))
+                continue
+
+            if source == "probe":
+                # Looks delisted: one API call to make sure, before treating it as empty from now on.
+                # Later gaps in the same plan go by what that first call found.
+                if self._stillTrading is None:
+                    piece = self.getAPICall(start, end, "D")
+                    self._stillTrading = not piece.empty
+                source = "api" if self._stillTrading else "empty"
+
+            if source == "empty":
+                # The index says there's nothing here, so no file read and no API call
+                if save:
+                    self.savedDayRanges.add(start, end)
+                continue
+
+            if source == "file":
+                # get the whole thing from downloaded files (once), then slice it
+                if df_full is None:
+                    df_full = self.fromFile(self.filepath)
+                if df_full is None:
+                    # couldn't read the file, so the API is all we've got
+                    source = "api"
+                else:
+                    piece = self._sliceDays(df_full, start, end)
+
+            if source == "api" and piece is None:
+                # fall back to API call
+                piece = self.getAPICall(start, end, "D")
+
+            pieces.append(piece)
+            if save:
+                if piece.empty and source == "file":
+                    # The file is the full history, so an empty slice really means "no trades in here".
+                    # Remember that, so we don't re-read the file for it.
+                    self.savedDayRanges.add(start, end)
+                else:
+                    self._append_day_df(piece, start, end)
+
+        pieces = [p for p in pieces if not p.empty]
+        if len(pieces) == 0:
+            return pd.DataFrame()
+        if len(pieces) == 1:
+            return pieces[0]
+        return pd.concat(pieces, ignore_index=True).sort_values(by="DATE", kind="mergesort").reset_index(drop=True)
+
+    # Returns the rows of df with day1 <= DATE <= day2.
+    # df has to be sorted by DATE (day_df, month_df, the stooq files and API results all are),
+    # so this is two binary searches and a positional slice, instead of building two boolean masks.
+    def _sliceDays(self, df, day1, day2):
+        if df.empty:
+            return df
+        lo = df["DATE"].searchsorted(day1, side="left")
+        hi = df["DATE"].searchsorted(day2, side="right")
+        return df.iloc[lo:hi]
+
+    # Plans where each part of [day1, day2] should come from.
+    # Returns a sorted list of (source, start, end), where source is:
+    #   "memory" -- already in day_df
+    #   "file"   -- in the downloaded stooq file (anything before tsrc.lastUpdated())
+    #   "api"    -- newer than the local files, or we have no local file for this symbol
+    #   "empty"  -- known to have no trades: outside the file's first/last trade date, or after the
+    #               last trade of a symbol that's stopped trading (see tsrc.getCoverage())
+    #   "probe"  -- after the last trade of a symbol that looks delisted: one API call decides
+    #               whether it's "api" or "empty" (see _deadState())
+    def _planDayFetch(self, day1, day2):
+        plan = []
+        gaps = self.missingRanges(day1, day2)
+
+        # whatever isn't a gap is already in memory
+        cursor = day1
+        for start, end in gaps:
+            if start > cursor:
+                plan.append(("memory", cursor, start - self.savedDayRanges.step))
+            cursor = end + self.savedDayRanges.step
+        if cursor <= day2:
+            plan.append(("memory", cursor, day2))
+
+        # local files end the day before lastUpdated()
+        step = self.savedDayRanges.step
+        localEnd = self.tsrc.lastUpdated(self.filepath) - step
+        coverage = self.tsrc.getCoverage(self.filepath)
+        # decided once for the whole plan, so a query with several gaps past localEnd still probes at most once
+        afterLocal = {"alive": "api", "probe": "probe", "dead": "empty"}[self._deadState(coverage, localEnd)]
+        for start, end in gaps:
+            if self.filepath is None:
+                plan.append(("api", start, end))
+                continue
+            if start <= localEnd:
+                plan.extend(self._planFileRange(start, min(end, localEnd), coverage))
+            if end > localEnd:
+                plan.append((afterLocal, max(start, localEnd + step), end))
+
+        plan.sort(key=lambda p: p[1])
+        return plan
+
+    # Splits [start, end] of the local file's range into "file" (between the first and last trade)
+    # and "empty" (before the first / after the last trade, or everything if the file has no bars).
+    # Without coverage info it's all "file", like before.
+    def _planFileRange(self, start, end, coverage):
+        if coverage is None:
+            return [("file", start, end)]
+        first, last, rows = coverage
+        if rows == 0:
+            return [("empty", start, end)]
+
+        step = self.savedDayRanges.step
+        lastEnd = last + timedelta(days=1) - step  # the end of the last trading day
+        plan = []
+        if start < first:
+            plan.append(("empty", start, min(end, first - step)))
+        if start <= lastEnd and end >= first:
+            plan.append(("file", max(start, first), min(end, lastEnd)))
+        if end > lastEnd:
+            plan.append(("empty", max(start, lastEnd + step), end))
+        return plan
+
+    # Whether to ask the API for anything after localEnd (the local file's last day):
+    #   "alive" -- yes (it's still trading, or we don't know anything about it)
+    #   "probe" -- the file's last trade is more than DEAD_AFTER before localEnd, so it looks delisted,
+    #              but the API hasn't confirmed that yet: ask once
+    #   "dead"  -- looked delisted and the API had nothing newer either, so no point asking again
+    def _deadState(self, coverage, localEnd):
+        if coverage is None:
+            return "alive"
+        first, last, rows = coverage
+        if not (rows == 0 or last < localEnd - DEAD_AFTER):
+            return "alive"
+        if self._stillTrading is None:
+            return "probe"
+        return "alive" if self._stillTrading else "dead"
 
 
         
     # Returns a dataframe of monthly trade activity for this symbol
     def getMonthTradeRange(self, day1:datetime, day2:datetime, save = False) -> pd.DataFrame:
-        print("At least running this function i guess")
         if day1 > day2: # swap the values to ensure day1 is less than day2
             day1, day2 = day2, day1 
         # verify day is valid. Returns an empty dataframe if not.
@@ -331,24 +559,44 @@ class Stonk:
         df = pd.DataFrame()
 
         # Returns local data if it's already saved
-        # Shoo, this doesn't read from files yet, only calls the API.
-        # I could make a function that aggregates the local files' daily info into monthly trade data...
-        # but let's keep our eyes on the prize.
         if self.inRange(day1, day2, "M"):
-            # df = self.month_df[(self.month_df["DATE"] <= day2 and self.month_df["DATE"] >= day1)]
-            # from gpt: "Ah — good instinct! You’re super close — but there’s a subtle pandas gotcha here.
-            # You can’t use plain Python and or or inside a pandas filter, because those work on single boolean values, not arrays of booleans.""
-            df = self.month_df[(self.month_df["DATE"] <= day2) & (self.month_df["DATE"] >= day1)]
+            df = self._sliceDays(self.month_df, day1, day2)
+        elif self.filepath is not None and (day2 <= self.tsrc.lastUpdated(self.filepath)
+                                            or self._deadState(self.tsrc.getCoverage(self.filepath),
+                                                               self.tsrc.lastUpdated(self.filepath)) == "dead"):
+            # Aggregates the local file's daily bars into monthly bars (see resample.py), no API needed
+            # (a delisted symbol's file already has its whole history)
+            df = self.getResampledRange(day1, day2, "M")
+            if df.empty and "M" not in self._resampled:
+                # the local file couldn't be read (getResampled doesn't cache that), so ask the API instead
+                df = self.getAPICall(day1, day2, "M")
         else:
             # fall back to API call
             df = self.getAPICall(day1, day2, "M")
             # print(f"Monthly dataframe in branch 2 : \n{df}")
         
-        if save: self._append_month_df(df)
+        if save: self._append_month_df(df, day1, day2)
         
         return df   
         
 
+    # Returns weekly ("W"), monthly ("M"), quarterly ("Q") or yearly ("Y") bars for [day1, day2],
+    # built from the local daily file.
+    def getResampledRange(self, day1:datetime, day2:datetime, freq="M") -> pd.DataFrame:
+        if day1 > day2:
+            day1, day2 = day2, day1
+        return self._sliceDays(self.getResampled(freq), day1, day2)
+
+    # Whole-history bars at freq, aggregated from the local daily file once and then cached on this object
+    def getResampled(self, freq="M") -> pd.DataFrame:
+        if freq not in self._resampled:
+            df_full = self.fromFile(self.filepath) if self.filepath is not None else None
+            if df_full is None:
+                return Stonk._emptyFrame()
+            # compact like every other frame we hand out (and cache), whichever branch built it
+            self._resampled[freq] = stooqCache.compactFrame(resample.resampleOHLCV(df_full, freq), freq)
+        return self._resampled[freq]
+
     def setDayTrade(self, day:datetime):
         return self.getDayTrade(day, save=True)
 
@@ -373,10 +621,113 @@ class Stonk:
     # order executed? (yes/no)
     # fill price = (price)
     # fill date = (this day) / (n/a, order still open)
-    def queryTrailingStopPercent(self, percent, startDate, endDate=datetime.today()):
+    #
+    # percent and startDate can also be lists/arrays -- every (startDate, percent) combination is
+    # simulated in one vectorised pass per start date (see trailingStop.py).
+    # Returns a DataFrame with one row per combination (columns in trailingStop.result_columns).
+    def queryTrailingStopPercent(self, percent, startDate, endDate=None, save=False):
+        if endDate is None:
+            endDate = datetime.today()
+
+        startDates = pd.to_datetime(np.atleast_1d(startDate))
+        if endDate < startDates.min():
+            if len(startDates) > 1:
+                print(f"[Warning] endDate {endDate:%Y-%m-%d} is before the first startDate {startDates.min():%Y-%m-%d}")
+                return pd.DataFrame(columns=trailingStop.result_columns)
+            # swap the values, same as getDayTradeRange does
+            startDates, endDate = pd.to_datetime([endDate]), startDates[0].to_pydatetime()
+
+        df = self.getDayTradeRange(startDates.min().to_pydatetime(), endDate, save)
+        if df.empty:
+            print(f"[Warning] no daily data for {self.symb} between {startDates.min():%Y-%m-%d} and {endDate:%Y-%m-%d}")
+            return pd.DataFrame(columns=trailingStop.result_columns)
 
         # Uses HLC/3 estimate (high + low + close)/3
-        print("noth ere yet")
+        results = trailingStop.simulateFromFrame(df, percent, startDates, endDate)
+
+        # Only spell it out for single questions, not parameter sweeps
+        if len(results) == 1 and pd.isna(results.iloc[0]["ENTRY_PRICE"]):
+            print(f"[Warning] {self.symb} didn't trade between {startDates[0]:%Y-%m-%d} and {endDate:%Y-%m-%d}, no order to simulate")
+        elif len(results) == 1:
+            r = results.iloc[0]
+            print(f"If you had placed a Trailing Stop order on {self.symb} for {r['PERCENT']:g}% on {r['ENTRY_DATE']:%Y-%m-%d},")
+            print(f"then, by {endDate:%Y-%m-%d},")
+            if r["FILLED"]:
+                print(f"\tit would have filled on {r['FILL_DATE']:%Y-%m-%d} at {r['FILL_PRICE']:.4f}")
+            else:
+                print("\tit would not have filled by endDate and would remain open.")
+            print(f"initial price on {r['ENTRY_DATE']:%Y-%m-%d} = {r['ENTRY_PRICE']:.4f}")
+            print(f"max price on {r['MAX_DATE']:%Y-%m-%d} = {r['MAX_PRICE']:.4f}")
+
+        return results
+
+
+
+    ### Indicators:
+    # (formulas are in indicators.py / notes.txt)
+
+    # Returns the daily indicator frame (DATE, TYPICAL, MONEY_FLOW, SIGNED_FLOW, OBV_DELTA, OBV, CLV, AD)
+    # for everything in day_df, or just [day1, day2] if given.
+    # The result is cached. If day_df only grew at the end since last time (the usual case when
+    # loading forward in time), only the new bars get computed. Anything else (bars inserted before
+    # the last cached one) recomputes from scratch.
+    def getIndicatorsDaily(self, day1=None, day2=None) -> pd.DataFrame:
+        df = self.day_df
+        cached = self._dayIndicators
+        n = 0 if cached is None else len(cached)
+
+        if n > 0 and len(df) >= n and df["DATE"].iloc[n - 1] == self._dayIndicatorState.lastDate:
+            if len(df) > n:
+                tail = self._dayIndicatorState.extend(df.iloc[n:])
+                self._dayIndicators = pd.concat([cached, tail], ignore_index=True)
+        else:
+            self._dayIndicatorState = indicators.IndicatorState()
+            self._dayIndicators = self._dayIndicatorState.extend(df)
+
+        if day1 is None or day2 is None:
+            return self._dayIndicators
+        return self._sliceDays(self._dayIndicators, day1, day2)
+
+    # Returns the overall On-Balance-Volume (OBV) using daily calculations
+    # (the OBV change from day1 to day2, i.e. OBV starting at 0 on day1)
+    def getOBVDaily(self, day1, day2) -> int:
+        ind = self._loadedIndicatorsDaily(day1, day2)
+        if ind.empty:
+            print("[Warning] getOBVDaily received an empty DataFrame()")
+            return 0
+        return int(ind["OBV_DELTA"].iloc[1:].sum())
+
+    # Returns [(date, OBV), ...] for every trading day in [day1, day2], starting at 0 on day1
+    def getOBVListDaily(self, day1, day2) -> list[tuple[datetime, int]]:
+        ind = self._loadedIndicatorsDaily(day1, day2)
+        if ind.empty:
+            return []
+        obv = ind["OBV"] - ind["OBV"].iloc[0]
+        return [(d.to_pydatetime(), int(v)) for d, v in zip(ind["DATE"], obv)]
+
+    # Returns the overall On-Balance-Volume (OBV) using monthly calculations
+    def getOBVMonthly(self, day1, day2) -> int:
+        ind = indicators.computeIndicators(self.getMonthTradeRange(day1, day2, True))
+        if ind.empty:
+            print("[Warning] getOBVMonthly received an empty DataFrame()")
+            return 0
+        return int(ind["OBV_DELTA"].iloc[1:].sum())
+
+    def getOBVListMonthly(self, day1, day2) -> list[tuple[datetime, int]]:
+        ind = indicators.computeIndicators(self.getMonthTradeRange(day1, day2, True))
+        if ind.empty:
+            return []
+        obv = ind["OBV"] - ind["OBV"].iloc[0]
+        return [(d.to_pydatetime(), int(v)) for d, v in zip(ind["DATE"], obv)]
+
+    # Makes sure [day1, day2] is loaded into day_df (so the indicator cache can be reused), then slices it
+    def _loadedIndicatorsDaily(self, day1, day2):
+        if day1 > day2:
+            day1, day2 = day2, day1
+        day1 = day1.replace(hour=0, minute=0, second=0)
+        day2 = day2.replace(hour=23, minute=59, second=59)
+        self.getDayTradeRange(day1, day2, True)
+        return self.getIndicatorsDaily(day1, day2)
 
 
 
@@ -407,26 +758,6 @@ class Stonk:
     If Close = Previous Close: OBV unchanged
     Rising OBV = accumulation, Falling OBV = distribution
     '''
-'''
-    # Returns the overall On-Balance-Volume (OBV) using daily calculations
-    def getOBVDaily(self, day1, day2) -> int:
-        df = self.getDayTradeRange(day1, day2)
-
-        if df != pd.DataFrame():
-            
-        else:
-            print("Warning: getOBVDaily received an empty DataFrame()")
-            return -1
-
-    # Returns the overall On-Balance-Volume (OBV) using monthly calculations
-    def getOBVMonthly(self) -> int:
-
-
-    def getOBVListDaily(self) -> list[tuple[datetime, int]]:
-
-    
-    def getOBVListMonthly(self) -> list[tuple[datetime, int]]:
-'''
 '''
     ### Calculating data, making observations on data:
 With just OHLCV (Open, High, Low, Close, Volume), you can estimate sentiment using several approaches:
@@ -444,7 +775,6 @@ With just OHLCV (Open, High, Low, Close, Volume), you can estimate sentiment usi
     ```
     Rising OBV = accumulation, Falling OBV = distribution'''
 
-#    def getOBV(self, df: pd.DataFrame, 
 
 
 
@@ -0,0 +1,313 @@
+import numpy as np
+import pandas as pd
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from tickerSource import relative_folderpath
+
+# One-time conversion of the Stooq ASCII files into typed NumPy arrays.
+# Parsing "<TICKER>,<PER>,<DATE>,..." text with pd.read_csv + to_datetime + to_numeric
+# is by far the slowest part of a local lookup, and the files basically never change.
+# So: parse once, save a structured .npy next to a small .json of metadata,
+# and every later read is just a memory-map of the .npy.
+
+# The cache is keyed by the source path + its mtime/size, so if a file gets re-downloaded
+# (or appended to), the stale entry is thrown away and rebuilt on the next read.
+
+cache_folderpath = "data/cache/stooq/"
+
+# set this flag to "False" to always parse the .txt files directly (old behavior)
+useCache = True
+
+# Memory budget for frames kept in memory by loadFrame (see SeriesCache below)
+series_cache_bytes = 256 * 1024 * 1024
+
+# Columns we keep numerically, in the order they appear in the Stooq files
+numeric_cols = ["OPEN", "HIGH", "LOW", "CLOSE", "VOL", "OPENINT"]
+
+# The compact schema Stonk keeps its bars in (see compactFrame):
+#   DATE stays datetime64 so slicing/comparing with datetimes keeps working,
+#   prices are float32 (~7 significant digits, plenty for a quote),
+#   VOLUME is int64 (float64 for the few series with fractional volume),
+#   PER is a 1-byte categorical, and TICKER / TIME / OPENINT are dropped (constant per file,
+#   the Stonk already knows its own symbol).
+compact_columns = ["DATE", "OPEN", "HIGH", "LOW", "CLOSE", "VOLUME", "PER"]
+price_cols = ["OPEN", "HIGH", "LOW", "CLOSE"]
+per_dtype = pd.CategoricalDtype(["D", "W", "M", "Q", "Y"])
+
+
+# Where the cache entry for a source file lives (without extension)
+def cachePath(filepath):
+    key = hashlib.sha1(os.path.abspath(filepath).encode("utf-8")).hexdigest()[:20]
+    return os.path.join(cache_folderpath, key)
+
+
+# Parses a Stooq text file exactly like Stonk.fromFile used to.
+def parseText(filepath) -> pd.DataFrame:
+    df = pd.read_csv(filepath)
+    df.columns = df.columns.str.strip("<>").str.upper()
+
+    df["DATE"] = pd.to_datetime(df["DATE"], format="%Y%m%d")
+    for col in numeric_cols:
+        df[col] = pd.to_numeric(df[col])
+
+    return df.rename(columns={"VOL": "VOLUME"})
+
+
+# Converts a parsed frame to a structured array + metadata, and writes both atomically.
+def _writeCache(filepath, df, stat):
+    base = cachePath(filepath)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+
+    fields = [("DATE", "M8[D]")]
+    for col in ["OPEN", "HIGH", "LOW", "CLOSE", "VOLUME", "OPENINT"]:
+        # Volume and open interest are integers for most files, but not all (indexes, fx)
+        dtype = "i8" if pd.api.types.is_integer_dtype(df[col]) else "f8"
+        fields.append((col, dtype))
+
+    arr = np.empty(len(df), dtype=fields)
+    arr["DATE"] = df["DATE"].values.astype("M8[D]")
+    for name, _ in fields[1:]:
+        arr[name] = df[name].values
+
+    meta = {
+        "path": filepath,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "ticker": str(df["TICKER"].iloc[0]) if len(df) > 0 else "",
+        "per": str(df["PER"].iloc[0]) if len(df) > 0 else "",
+        "time": int(df["TIME"].iloc[0]) if len(df) > 0 else 0,
+    }
+
+    # write to temp files first, so a crash never leaves half a cache entry behind
+    with open(base + ".npy.tmp", "wb") as f:
+        np.save(f, arr)
+    with open(base + ".json.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(base + ".npy.tmp", base + ".npy")
+    os.replace(base + ".json.tmp", base + ".json")
+
+    return arr, meta
+
+
+# Returns the cached metadata if it still matches the source file, else None
+def _readMeta(filepath, stat):
+    base = cachePath(filepath)
+    try:
+        with open(base + ".json", "r") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("mtime_ns") != stat.st_mtime_ns or meta.get("size") != stat.st_size:
+        return None
+    if not os.path.exists(base + ".npy"):
+        return None
+    return meta
+
+
+# Returns (structured array, metadata) for a Stooq file.
+# The array is a read-only memory map, so it's basically free until you touch the data.
+def loadArrays(filepath):
+    stat = os.stat(filepath)
+    meta = _readMeta(filepath, stat)
+    if meta is not None:
+        try:
+            arr = np.load(cachePath(filepath) + ".npy", mmap_mode="r")
+            return arr, meta
+        except (OSError, ValueError) as e:
+            print(f"[Warning] corrupt cache for {filepath}, rebuilding: {e}")
+
+    df = parseText(filepath)
+    return _writeCache(filepath, df, stat)
+
+
+# On top of the disk cache: the frames loadFrame built recently, shared by every Stonk in the process.
+# Two Stonk("NVDA", "US") objects (or one symbol queried over and over in a loop over a working set)
+# then share one frame instead of each re-reading the file and holding its own copy.
+#
+# Least recently used frames get dropped once the total goes over maxBytes.
+# Entries are keyed by absolute path and remember the file's mtime/size, so a changed file is a miss.
+class SeriesCache:
+    def __init__(self, maxBytes=series_cache_bytes):
+        self.maxBytes = maxBytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # path -> (mtime_ns, size, df, nbytes)
+        self._lock = threading.Lock()
+
+    # variant tells apart different frames built from the same file (e.g. compact ones)
+    def get(self, filepath, stat, variant=""):
+        key = os.path.abspath(filepath) + variant
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[:2] != (stat.st_mtime_ns, stat.st_size):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # a shallow copy, so adding a column to it doesn't add it to everyone's frame
+            return entry[2].copy(deep=False)
+
+    def put(self, filepath, stat, df, variant=""):
+        key = os.path.abspath(filepath) + variant
+        # Shallow count: compact frames are all numeric apart from PER, whose categorical codes it counts
+        # (the few category strings are noise). Full frames' TICKER / PER hold one shared string object
+        # per column, so counting it once per row (deep=True) would overstate them.
+        nbytes = int(df.memory_usage(index=True, deep=False).sum())
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[3]
+            if nbytes > self.maxBytes:
+                return  # would just evict everything else
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, df, nbytes)
+            self.bytes += nbytes
+            self._evict()
+
+    def _evict(self):
+        while self.bytes > self.maxBytes and self._entries:
+            _, old = self._entries.popitem(last=False)
+            self.bytes -= old[3]
+            self.evictions += 1
+
+    # Change the memory budget (evicts right away if it shrank)
+    def setBudget(self, maxBytes):
+        with self._lock:
+            self.maxBytes = maxBytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "maxBytes": self.maxBytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# The process-wide one loadFrame uses
+seriesCache = SeriesCache()
+
+
+# Returns the same DataFrame that parseText() would, but through the caches.
+# compact=True returns it in the compact schema instead (see compactFrame).
+# Treat the frame as read-only -- its data is shared with every other caller that loaded this file.
+def loadFrame(filepath, compact=False) -> pd.DataFrame:
+    variant = "|compact" if compact else ""
+    stat = os.stat(filepath)
+    df = seriesCache.get(filepath, stat, variant)
+    if df is not None:
+        return df
+
+    df = _loadFrame(filepath, compact)
+    seriesCache.put(filepath, stat, df, variant)
+    return df.copy(deep=False)
+
+
+# Converts bars (from a file, the API or resample.py) to the compact schema.
+# per: the PER value to use if df doesn't have a PER column.
+# Frames that are already compact come back as they are.
+def compactFrame(df, per=None) -> pd.DataFrame:
+    if isCompact(df):
+        return df
+    volume = df["VOLUME"].to_numpy()
+    if volume.dtype.kind == "f" and np.array_equal(volume, np.round(volume)):
+        volume = volume.astype("i8")
+    elif volume.dtype.kind in "iu":
+        volume = volume.astype("i8")
+
+    out = pd.DataFrame({"DATE": df["DATE"].to_numpy(dtype="datetime64[ns]")})
+    for col in price_cols:
+        out[col] = df[col].to_numpy(dtype="f4")
+    out["VOLUME"] = volume
+    out["PER"] = pd.Categorical(df["PER"] if "PER" in df.columns else [per] * len(df), dtype=per_dtype)
+    return out
+
+
+def isCompact(df) -> bool:
+    if list(df.columns) != compact_columns:
+        return False
+    dtypes = df.dtypes
+    return (all(dtypes[col] == np.float32 for col in price_cols)
+            and dtypes["VOLUME"] in (np.int64, np.float64)
+            and dtypes["PER"] == per_dtype)
+
+
+def _loadFrame(filepath, compact=False) -> pd.DataFrame:
+    if not useCache:
+        df = parseText(filepath)
+        return compactFrame(df) if compact else df
+
+    arr, meta = loadArrays(filepath)
+    n = len(arr)
+    if compact:
+        # straight from the arrays, without building the wide frame first
+        return compactFrame(pd.DataFrame({
+            "DATE": arr["DATE"].astype("datetime64[ns]"),
+            "OPEN": arr["OPEN"], "HIGH": arr["HIGH"], "LOW": arr["LOW"], "CLOSE": arr["CLOSE"],
+            "VOLUME": arr["VOLUME"],
+        }), per=meta["per"])
+    df = pd.DataFrame({
+        "TICKER": [meta["ticker"]] * n,
+        "PER": [meta["per"]] * n,
+        "DATE": arr["DATE"].astype("datetime64[ns]"),
+        "TIME": np.full(n, meta["time"], dtype="i8"),
+        "OPEN": arr["OPEN"],
+        "HIGH": arr["HIGH"],
+        "LOW": arr["LOW"],
+        "CLOSE": arr["CLOSE"],
+        "VOLUME": arr["VOLUME"],
+        "OPENINT": arr["OPENINT"],
+    })
+    return df
+
+
+# The per-file loop every universe-wide job (batches, rankings, the flow cube, the universe store) runs.
+# rows: tuples / namedtuples whose last item (or filepathOf(row)) is a FILEPATH from TickerSource.df
+# Yields (row, arr, meta) for each file that's a non-empty daily series. Files that fail to load
+# are skipped with a warning.
+def iterDailyArrays(rows, filepathOf=None):
+    for row in rows:
+        filepath = filepathOf(row) if filepathOf is not None else row[-1]
+        try:
+            arr, meta = loadArrays(f"{relative_folderpath}{filepath}")
+        except Exception as e:
+            print(f"[Warning] skipping {filepath}, {e}")
+            continue
+        if meta["per"] != "D" or len(arr) == 0:
+            continue
+        yield row, arr, meta
+
+
+# Puts label columns ({"TICKER": "nvda", ...}, in that order) in front of a per-symbol result frame
+def withLabels(df, labels) -> pd.DataFrame:
+    for i, (col, value) in enumerate(labels.items()):
+        df.insert(i, col, value)
+    return df
+
+
+# Removes every cache entry (e.g. after re-downloading the whole stooq folder)
+def clearCache():
+    if not os.path.exists(cache_folderpath):
+        return 0
+    removed = 0
+    for name in os.listdir(cache_folderpath):
+        if name.endswith(".npy") or name.endswith(".json"):
+            os.remove(os.path.join(cache_folderpath, name))
+            removed += 1
+    return removed
@@ -0,0 +1,192 @@
+import hashlib
+import io
+import os
+import random
+import threading
+import time
+import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from pathlib import Path
+from urllib.parse import urlparse
+
+
+# Downloads from stooq.com for Stonk.getAPICall / getAPICallMany and stooqUpdater.py.
+# One shared client per process (see getDefaultClient), so every Stonk reuses the same pooled
+# connections and the same per-host rate limit instead of opening a new connection per call.
+
+
+# Spaces requests to the same host at least minInterval seconds apart (thread-safe)
+class _HostRateLimiter:
+    def __init__(self, minInterval):
+        self._minInterval = minInterval
+        self._lock = threading.Lock()
+        self._nextAllowed = {}
+
+    # Blocks until a request to host is allowed, and reserves that slot
+    def wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._nextAllowed.get(host, now))
+            self._nextAllowed[host] = slot + self._minInterval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+# On-disk cache of Stooq download bodies, keyed by (symbol, interval, day1, day2).
+# Historical bars never change, so an old window is cached forever.
+# A window that ends within the last recentDays can still grow (Stooq publishes the last
+# session's bar with a delay), so it expires after ttl seconds.
+class ResponseCache:
+    def __init__(self, folder="data/cache/api/", ttl=3600, recentDays=2):
+        self._folder = Path(folder)
+        self._ttl = ttl
+        self._recentDays = recentDays
+
+    def _path(self, symbol, day1, day2, interval):
+        key = f"{symbol.upper()}|{interval}|{day1:%Y%m%d}|{day2:%Y%m%d}"
+        return self._folder / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.csv"
+
+    # Returns the cached body, or None if it's missing or expired
+    def get(self, symbol, day1, day2, interval="d"):
+        path = self._path(symbol, day1, day2, interval)
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+
+        recent = day2.date() >= datetime.today().date() - timedelta(days=self._recentDays)
+        if recent and time.time() - stat.st_mtime > self._ttl:
+            return None
+        return path.read_text()
+
+    # Stores a body (written to a temp file first, so readers never see half of it)
+    def put(self, symbol, day1, day2, interval, text):
+        self._folder.mkdir(parents=True, exist_ok=True)
+        path = self._path(symbol, day1, day2, interval)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(text)
+        os.replace(tmp, path)
+
+    # Deletes every cached body. Returns how many were removed.
+    def clear(self):
+        if not self._folder.exists():
+            return 0
+        removed = 0
+        for path in self._folder.glob("*.csv"):
+            path.unlink()
+            removed += 1
+        return removed
+
+
+# baseUrl     = download endpoint (point it at a local stub server for testing, see testStooqClient.py)
+# maxWorkers  = how many downloads fetchMany runs at once
+# poolSize    = max pooled keep-alive connections per host
+# minInterval = minimum seconds between two requests to the same host
+# timeout     = per-request timeout in seconds
+# retries     = extra attempts after a failed request
+# backoff     = base delay in seconds, doubled after each failed attempt
+# cache       = optional ResponseCache consulted before every download
+class StooqClient:
+    def __init__(self, baseUrl="https://stooq.com/q/d/l/", maxWorkers=4, poolSize=8,
+                 minInterval=0.5, timeout=10, retries=3, backoff=1.0, cache=None):
+        self._baseUrl = baseUrl
+        self._maxWorkers = maxWorkers
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._limiter = _HostRateLimiter(minInterval)
+        self._cache = cache
+
+        # One pooled session, so repeated calls reuse connections instead of opening a new one each time
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    # The download URL for symbol (e.g. "NVDA.US") between day1 and day2
+    def buildUrl(self, symbol, day1, day2, interval="d"):
+        return f"{self._baseUrl}?s={symbol}&d1={day1:%Y%m%d}&d2={day2:%Y%m%d}&i={interval}"
+
+    # Downloads the raw CSV text, retrying with exponential backoff.
+    # Raises requests.exceptions.RequestException if every attempt failed.
+    def fetchText(self, symbol, day1, day2, interval="d"):
+        if self._cache is not None:
+            text = self._cache.get(symbol, day1, day2, interval)
+            if text is not None:
+                return text
+
+        url = self.buildUrl(symbol, day1, day2, interval)
+        host = urlparse(url).netloc
+
+        for attempt in range(self._retries + 1):
+            self._limiter.wait(host)
+            try:
+                response = self._session.get(url, timeout=self._timeout)
+                # Rate limited or server trouble: worth another try. Anything else 4xx is final.
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise requests.exceptions.HTTPError(f"{response.status_code} from {url}", response=response)
+                response.raise_for_status()
+
+                # Only real data gets cached -- not "No data" or limit messages, those might change
+                if self._cache is not None and response.text.lstrip().startswith("Date"):
+                    self._cache.put(symbol, day1, day2, interval, response.text)
+                return response.text
+
+            except requests.exceptions.RequestException as e:
+                status = e.response.status_code if e.response is not None else None
+                retryable = status is None or status == 429 or status >= 500
+                if not retryable or attempt == self._retries:
+                    raise
+                delay = self._backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+                print(f"[Warning] Stooq request for {symbol} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    # Downloads one symbol as a DataFrame with upper-case columns and a PER column, sorted by DATE.
+    # Empty if the download failed or had no data.
+    def fetch(self, symbol, day1, day2, interval="d") -> pd.DataFrame:
+        try:
+            text = self.fetchText(symbol, day1, day2, interval)
+        except requests.exceptions.RequestException as e:
+            print(f"[Warning] Failed to fetch {symbol} for {day1:%Y-%m-%d} to {day2:%Y-%m-%d}: {e}")
+            return pd.DataFrame()
+        return self.parse(text, interval)
+
+    # Turns a Stooq CSV body into the same frame shape Stonk uses
+    @staticmethod
+    def parse(text, interval="d") -> pd.DataFrame:
+        # Stooq answers unknown symbols / empty ranges with a plain "No data" body
+        if not text.strip() or not text.lstrip().startswith("Date"):
+            return pd.DataFrame()
+
+        df = pd.read_csv(io.StringIO(text), parse_dates=["Date"])
+        df = df.sort_values("Date").reset_index(drop=True)
+        df.columns = df.columns.str.upper()
+        df["PER"] = interval.upper()  # D for day, M for month
+        return df
+
+    # Downloads many symbols concurrently (bounded by maxWorkers, rate limited per host).
+    # Returns {symbol: DataFrame} (an empty DataFrame for failures)
+    def fetchMany(self, symbols, day1, day2, interval="d") -> dict:
+        symbols = list(symbols)  # iterated twice below, so a generator won't do
+        with ThreadPoolExecutor(max_workers=self._maxWorkers) as pool:
+            frames = pool.map(lambda s: self.fetch(s, day1, day2, interval), symbols)
+            return dict(zip(symbols, frames))
+
+    # Closes the pooled connections
+    def close(self):
+        self._session.close()
+
+
+_defaultClient = None
+
+
+# The process-wide shared client (created on first use)
+def getDefaultClient():
+    global _defaultClient
+    if _defaultClient is None:
+        _defaultClient = StooqClient(cache=ResponseCache())
+    return _defaultClient
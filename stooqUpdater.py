@@ -0,0 +1,173 @@
+import os
+from datetime import datetime, timedelta
+import stooqClient
+import json
+from tickerSource import TickerSource, relative_folderpath
+
+# filepath -> "YYYY-MM-DD" a stale symbol was last found to have nothing new (see updateAll)
+checked_datapath = "data/stooq/checked.json"
+# A symbol whose file's last bar is this old before its watermark counts as stale
+stale_after = timedelta(days=30)
+# ... and a stale symbol that came back empty is only asked about again after this long
+recheck_after = timedelta(days=30)
+
+# Keeps the local stooq files current, so the API branch in Stonk becomes the rare case.
+#
+# Per symbol:
+#   1. start from its watermark (TickerSource.lastUpdated(filepath) -- the global download date if
+#      it's never been refreshed)
+#   2. download only the bars from there up to yesterday (today's bar isn't final yet)
+#   3. append the new bars to the .txt file in the same <TICKER>,<PER>,<DATE>,... format
+#   4. advance that symbol's watermark to the day after the newest bar the file now has
+#      (never further -- if Stooq hasn't published yesterday's bar yet, the next run asks again)
+#
+# Symbols that come back empty and haven't traded in a long time (probably delisted) get a
+# "checked through" date in checked.json instead, and aren't downloaded again for recheck_after.
+#
+# Symbols sharing a watermark are downloaded together through StooqClient.fetchMany, which runs
+# them concurrently and rate limits per host. Watermarks are saved after every batch, so an
+# interrupted run just picks up where it stopped.
+
+
+# Last non-empty line of a text file, without reading the whole thing
+def _lastLine(path):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        block = 256
+        while True:
+            start = max(0, size - block)
+            f.seek(start)
+            lines = f.read(size - start).splitlines()
+            lines = [l for l in lines if l.strip()]
+            if (len(lines) > 1 or start == 0) and lines:
+                return lines[-1].decode("utf-8")
+            if start == 0:
+                return ""
+            block *= 4
+
+
+# Returns (stooq ticker like "NVDA.US", last stored date) from the file's last line,
+# or (None, None) if the file has no bars
+def _fileTail(path):
+    line = _lastLine(path)
+    if not line or line.startswith("<"):
+        return None, None
+    parts = line.split(",")
+    return parts[0], datetime.strptime(parts[2], "%Y%m%d")
+
+
+def _formatNumber(x):
+    x = float(x)
+    return str(int(x)) if x.is_integer() else repr(x)
+
+
+# Appends API bars (DATE, OPEN, HIGH, LOW, CLOSE, VOLUME) newer than lastDate to a stooq file.
+# Returns how many bars were written.
+def appendBars(path, stooqTicker, lastDate, df):
+    if df.empty:
+        return 0
+    if lastDate is not None:
+        df = df[df["DATE"] > lastDate]
+    if df.empty:
+        return 0
+
+    lines = []
+    for row in df.itertuples(index=False):
+        lines.append(f"{stooqTicker},D,{row.DATE:%Y%m%d},000000,{_formatNumber(row.OPEN)},{_formatNumber(row.HIGH)},"
+                     f"{_formatNumber(row.LOW)},{_formatNumber(row.CLOSE)},{_formatNumber(row.VOLUME)},0\n")
+
+    with open(path, "rb+") as f:
+        # make sure we start on a fresh line
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write("".join(lines).encode("utf-8"))
+    return len(lines)
+
+
+def _loadChecked():
+    if not os.path.exists(checked_datapath):
+        return {}
+    with open(checked_datapath, "r") as f:
+        raw = json.load(f)
+    return {path: datetime.strptime(day, "%Y-%m-%d") for path, day in raw.items()}
+
+
+def _saveChecked(checked):
+    raw = {path: f"{day:%Y-%m-%d}" for path, day in checked.items()}
+    with open(checked_datapath + ".tmp", "w") as f:
+        json.dump(raw, f, indent=0)
+    os.replace(checked_datapath + ".tmp", checked_datapath)
+
+
+# Refreshes every symbol in index (default: all of TickerSource.df).
+# batchSize = how many symbols go into one fetchMany call between watermark saves
+def updateAll(index=None, client=None, batchSize=200):
+    src = TickerSource()
+    if index is None:
+        index = src.df
+    if client is None:
+        client = stooqClient.getDefaultClient()
+
+    today = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
+    yesterday = today - timedelta(days=1)
+
+    checked = _loadChecked()
+
+    # Group by watermark, so each group can share one date range
+    groups = {}
+    for ticker, country, filepath in zip(index["TICKER"], index["COUNTRY"], index["FILEPATH"]):
+        start = src.lastUpdated(filepath)
+        if start > yesterday:
+            continue
+        if filepath in checked and today - checked[filepath] < recheck_after:
+            continue
+        groups.setdefault(start, []).append((f"{ticker}.{country}".upper(), filepath))
+
+    total = sum(len(g) for g in groups.values())
+    print(f"Updating {total} symbols ({len(index) - total} already current or recently checked)")
+
+    done = 0
+    barsWritten = 0
+    for start, symbols in sorted(groups.items()):
+        for i in range(0, len(symbols), batchSize):
+            batch = symbols[i:i + batchSize]
+            frames = client.fetchMany([s for s, _ in batch], start, yesterday)
+
+            marks = {}
+            for symb, filepath in batch:
+                df = frames.get(symb)
+                path = f"{relative_folderpath}{filepath}"
+                try:
+                    stooqTicker, lastDate = _fileTail(path)
+                    if df is None or df.empty:
+                        # Nothing new, or the download failed -- try again next run, unless the
+                        # symbol looks delisted, then only every recheck_after
+                        if lastDate is None or lastDate < start - stale_after:
+                            checked[filepath] = today
+                        continue
+                    barsWritten += appendBars(path, stooqTicker or symb, lastDate, df)
+                    checked.pop(filepath, None)
+
+                    # The file is complete through its newest bar -- the watermark can't go past that
+                    newest = max(d for d in [lastDate, df["DATE"].max().to_pydatetime()] if d is not None)
+                    mark = min(newest + timedelta(days=1), today)
+                    if mark > start:
+                        marks[filepath] = mark
+                except Exception as e:
+                    print(f"[Warning] failed to update {symb} at {path}: {e}")
+
+            src.setWatermarks(marks)
+            _saveChecked(checked)
+            done += len(batch)
+            print(f"updated {done}/{total} symbols, {barsWritten} new bars so far")
+
+    print(f"Done updating local stooq files: {barsWritten} new bars")
+    return barsWritten
+
+
+if __name__ == "__main__":
+    updateAll()
@@ -0,0 +1,86 @@
+import http.server
+import threading
+import tempfile
+import urllib.parse
+from datetime import datetime
+from stooqClient import StooqClient, ResponseCache
+
+
+
+print("--------------------------------------- NEW RUN OF testStooqClient.py ----------------------------------")
+
+
+# Checks StooqClient against a tiny local stand-in for stooq.com (baseUrl points at it),
+# so none of this touches the real site or the daily request limits.
+#   NVDA.US -- two bars, sent newest first (the client should sort them)
+#   NONE.US -- Stooq's "No data" answer
+#   FAIL.US -- 503 on every other request, so it needs one retry
+
+
+hits = {}
+
+class StubStooq(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        symbol = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)["s"][0]
+        hits[symbol] = hits.get(symbol, 0) + 1
+
+        if symbol == "FAIL.US" and hits[symbol] % 2 == 1:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if symbol == "NONE.US":
+            body = b"No data"
+        else:
+            body = b"Date,Open,High,Low,Close,Volume\n2025-11-05,1,2,0.5,1.5,100\n2025-11-04,1,2,0.5,1.2,90\n"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def startStub():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubStooq)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def clientTesting():
+    server = startStub()
+    cacheFolder = tempfile.mkdtemp()
+    client = StooqClient(baseUrl=f"http://127.0.0.1:{server.server_port}/q/d/l/", minInterval=0,
+                         backoff=0.01, cache=ResponseCache(cacheFolder))
+    day1, day2 = datetime(2025, 11, 1), datetime(2025, 11, 10)
+
+    df = client.fetch("NVDA.US", day1, day2)
+    print(df)
+    assert list(df["DATE"].dt.strftime("%Y-%m-%d")) == ["2025-11-04", "2025-11-05"]
+    assert (df["PER"] == "D").all()
+
+    # second time comes from the on-disk cache, not the server
+    client.fetch("NVDA.US", day1, day2)
+    assert hits["NVDA.US"] == 1
+
+    assert client.fetch("NONE.US", day1, day2).empty
+
+    # 503 then 200 -- retried once
+    assert len(client.fetch("FAIL.US", day1, day2)) == 2
+    assert hits["FAIL.US"] == 2
+
+    # a generator works as well as a list
+    frames = client.fetchMany((s for s in ["NVDA.US", "NONE.US"]), day1, day2)
+    assert sorted(frames) == ["NONE.US", "NVDA.US"]
+    assert len(frames["NVDA.US"]) == 2 and frames["NONE.US"].empty
+
+    client.close()
+    server.shutdown()
+    print(f"StooqClient checks passed, requests per symbol: {hits}")
+
+
+clientTesting()
@@ -1,6 +1,14 @@
-import pandas as pd
 from datetime import datetime, timedelta
 import os
+import json
+import pickle
+import tempfile
+from typing import TYPE_CHECKING
+
+# pandas is only imported where a frame is actually needed (see _LazyFrame below), so a process
+# that just does getPath lookups doesn't pay for importing it.
+if TYPE_CHECKING:
+    import pandas as pd
 
 # IF YOU TRY TO RUN THIS FILE, AND GET NO OUTPUT
 # YOU HAVE TO SET build_new_formatted_list = True
@@ -12,6 +20,12 @@ import os
 relative_folderpath = "data/stooq/"
 raw_datapath = "data/stooq/filepaths.txt"
 formatted_datapath = "data/stooq/filepathsformatted.txt"
+# Per-symbol "local data is complete up to (not including) this date", written by stooqUpdater.py
+watermarks_datapath = "data/stooq/watermarks.json"
+# Pickled copies of filepathsformatted.txt (rebuilt whenever the text file changes):
+#   lookup.pkl -- just the (ticker, country) index and per-file coverage, plain python, no pandas needed
+#   frame.pkl  -- the whole typed dataframe, with categorical TICKER/COUNTRY/EXCHANGE
+binary_folderpath = "data/cache/tickersource/"
 # ^^ Could improve my format with a "verbose Country" column that says, like, "United States" instead of "us"
 # and maybe even detects international stocks
 # although honestly, it should be a higher-level overhead to this -- that should be a function in 
@@ -30,18 +44,69 @@ build_new_formatted_list = False
 # the "Class-Level Attribute" feature is essentially a way to ensure that this large dataframe is shared 
 # across all instances, instead of every object storing its own 25kb mapping.
 # (wouldn't be the end of the world on modern machines, but let's be intentional here.)
+#
+# The dataframe itself is lazy now: most callers only ever need the index, so df isn't loaded
+# until something actually touches TickerSource.df (or self.df).
+class _LazyFrame:
+    def __get__(self, obj, owner):
+        if owner._df is None:
+            print("Loading tickerSource dataframe")
+            owner._df = loadFrame()
+        return owner._df
+
+    def __set__(self, obj, value):
+        type(obj)._df = value
+
+
 class TickerSource:
-    df = None
+    df = _LazyFrame()
+    _df = None
+    index = None  # (ticker, country) -> [(exchange, filepath), ...], built once from df
+    coverage = None  # FILEPATH -> (first date, last date, rows, size, mtime), see getCoverage
     lastUpdate = None  # Data last updated (downloaded) Nov 4, 2025
+    watermarks = None  # FILEPATH -> datetime, for symbols refreshed since then (see stooqUpdater.py)
 
     def __init__(self):
-        if TickerSource.df is None:
-            print("Loading tickerSource dataframe")
-            TickerSource.df = pd.read_csv(formatted_datapath)
+        if TickerSource.index is None:
+            lookup = loadLookup()
+            TickerSource.index = lookup["index"]
+            TickerSource.coverage = lookup["coverage"]
         if TickerSource.lastUpdate is None:
             TickerSource.lastUpdate = datetime(year=2025, month=11, day=4)
+        if TickerSource.watermarks is None:
+            TickerSource.watermarks = TickerSource.loadWatermarks()
         
-        self.df = TickerSource.df
+        self.index = TickerSource.index
+
+    # Builds the hash map used by getPath, so lookups don't have to mask all ~24k rows every time.
+    # A list per key, because ~1k tickers show up on more than one exchange (see checkTickers)
+    @staticmethod
+    def buildIndex(df):
+        index = {}
+        for ticker, country, exchange, path in zip(df["TICKER"], df["COUNTRY"], df["EXCHANGE"], df["FILEPATH"]):
+            index.setdefault((str(ticker), str(country)), []).append((exchange, path))
+        return index
+
+    # FILEPATH -> (first date, last date, rows, size, mtime) from the scan columns (see buildFormatted).
+    # Empty if the index predates those columns.
+    @staticmethod
+    def buildCoverage(df):
+        if "ROWS" not in df.columns:
+            return {}
+        coverage = {}
+        for path, first, last, rows, size, mtime in zip(df["FILEPATH"], df["FIRST_DATE"], df["LAST_DATE"],
+                                                        df["ROWS"], df["SIZE"], df["MTIME"]):
+            first = None if first != first else first.to_pydatetime()  # NaT != NaT
+            last = None if last != last else last.to_pydatetime()
+            coverage[path] = (first, last, int(rows), int(size), int(mtime))
+        return coverage
+
+    # Adds (or refreshes) a SECTOR column on the shared dataframe.
+    # sectors: {(ticker, country): sector}, lowercase keys like the rest of the index.
+    # Anything not in there gets "Unknown".
+    def setSectors(self, sectors:dict):
+        keys = zip(self.df["TICKER"].astype(str), self.df["COUNTRY"].astype(str))
+        self.df["SECTOR"] = [sectors.get(k, "Unknown") for k in keys]
 
     def numStocksLoaded(self):
         valueCounts = self.df["COUNTRY"].value_counts()
@@ -67,20 +132,25 @@ class TickerSource:
         # This deal is a sure thing. I now own triples of the barracuda.
 
     
-    def getPath(self, ticker:str, country:str, printout=False):
+    # exchange is optional -- it's only needed to pick between duplicate tickers in the same country.
+    # Without it, you get the first one listed (same as the old behavior).
+    def getPath(self, ticker:str, country:str, printout=False, exchange=None):
         try:
             # my og code was foolish I guess
             # slice = self.df["COUNTRY" == country]["TICKER" == ticker]
             # filepath = slice["FILEPATH"].iloc[0]
             # slice = self.df[(self.df["COUNTRY"] == country) & (self.df["TICKER"] == ticker)]
+            # ^^ that mask was O(n) per lookup, now it's a dict lookup into self.index
 
 
             # Paths are actually all lowercase. We're using uppercase in stonk.
             ticker = ticker.lower()
             country = country.lower()
 
-            slice = self.df[(self.df["COUNTRY"] == country) & (self.df["TICKER"] == ticker)]
-            topSlice = slice["FILEPATH"].iloc[0]
+            entries = self.index[(ticker, country)]
+            if exchange is not None:
+                entries = [e for e in entries if e[0] == exchange]
+            topSlice = entries[0][1]
 
             # Be sure to include the relative_folderpath in here
             filepath = f"{relative_folderpath}{topSlice}" 
@@ -91,8 +161,31 @@ class TickerSource:
             return filepath
         except Exception as e:
             print(f"[Warning] ticker not found for {ticker}.{country}", end='\t')
-            print(f" -- because of error {e}")
+            print(f" -- because of error {e!r}")
             return None
+
+    # Bulk version of getPath.
+    # symbols can be "NVDA.US" strings or (ticker, country) / (ticker, country, exchange) tuples.
+    # Returns a list of filepaths in the same order (None where the symbol isn't found).
+    def getPaths(self, symbols) -> list:
+        paths = []
+        for symb in symbols:
+            if isinstance(symb, str):
+                ticker, _, country = symb.rpartition(".")
+                exchange = None
+            else:
+                ticker, country = symb[0], symb[1]
+                exchange = symb[2] if len(symb) > 2 else None
+
+            entries = self.index.get((ticker.lower(), country.lower()), [])
+            if exchange is not None:
+                entries = [e for e in entries if e[0] == exchange]
+            paths.append(f"{relative_folderpath}{entries[0][1]}" if entries else None)
+        return paths
+
+    # Every exchange this ticker is listed on, in this country
+    def getExchanges(self, ticker:str, country:str) -> list:
+        return [e[0] for e in self.index.get((ticker.lower(), country.lower()), [])]
         
     # Tests if os can actually find the file from getPath
     def testPath(self, ticker, country):
@@ -105,9 +198,55 @@ class TickerSource:
             return False
         
         
-    def lastUpdated(self):
+    # (first trade date, last trade date, rows) in this symbol's local file, straight from the index,
+    # so nobody has to open the file to find out. first/last are None when the file has no bars.
+    # Returns None if we don't know: no scan columns in the index, or the file changed since the
+    # index was built (e.g. stooqUpdater appended to it) -- one stat call to check.
+    def getCoverage(self, filepath):
+        if filepath is None:
+            return None
+        if filepath.startswith(relative_folderpath):
+            filepath = filepath[len(relative_folderpath):]
+        entry = TickerSource.coverage.get(filepath)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(f"{relative_folderpath}{filepath}")
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != entry[3:]:
+            return None
+        return entry[:3]
+
+    # With no filepath, this is the date the whole stooq folder was downloaded.
+    # With a filepath (as returned by getPath, or relative to the stooq folder), it's that symbol's
+    # own watermark if the updater has refreshed it, else the global date.
+    # Either way: local files have every bar BEFORE this date.
+    def lastUpdated(self, filepath=None):
+        if filepath is not None:
+            if filepath.startswith(relative_folderpath):
+                filepath = filepath[len(relative_folderpath):]
+            mark = TickerSource.watermarks.get(filepath)
+            if mark is not None:
+                return max(mark, TickerSource.lastUpdate)
         return TickerSource.lastUpdate
 
+    @staticmethod
+    def loadWatermarks():
+        if not os.path.exists(watermarks_datapath):
+            return {}
+        with open(watermarks_datapath, "r") as f:
+            raw = json.load(f)
+        return {path: datetime.strptime(day, "%Y-%m-%d") for path, day in raw.items()}
+
+    # Advances the watermarks for some symbols ({FILEPATH: datetime}) and saves them all
+    def setWatermarks(self, marks:dict):
+        TickerSource.watermarks.update(marks)
+        raw = {path: f"{day:%Y-%m-%d}" for path, day in TickerSource.watermarks.items()}
+        with open(watermarks_datapath + ".tmp", "w") as f:
+            json.dump(raw, f, indent=0)
+        os.replace(watermarks_datapath + ".tmp", watermarks_datapath)
+
 
 
 
@@ -132,99 +271,210 @@ class TickerSource:
 # COUNTRY,EXCHANGE,TICKER,FILEPATH
 # filepaths.txt is at "data/stooq/filepaths.txt"
 
+# Now: buildFormatted() walks the stooq folder itself (scandir, one process per exchange folder)
+# and also records each file's size/mtime and first/last date/row count. Re-running it only
+# reads the files that changed, so it's cheap to do after every stooqUpdater run.
+
 
 
 # gets the filepath of this ticker's daytrade info, stored locally 
 def getLocalPath(ticker):
     print(f"nice try, {ticker}")
-    
-# Creates the formatted list from the raw list
-def formatFromRaw(fullService=True):
-    # if fullService = True, write the entire list, not just testing a portion
-
-    row_count = 0
-    if os.path.exists(raw_datapath):
-        print(f"found raw data at {raw_datapath}")
-        with open(raw_datapath, "r") as f:
-            row_count = sum(1 for _ in f)
-            print(f"Number of rows: {row_count}")
-    else:
-        print(f"could not find raw data at {raw_datapath}")
-
-    df_raw = pd.read_csv(raw_datapath, sep="\n")
-    print("Printing first 10 raw entries:")
-    print(df_raw.head(10))
 
-    # Split the filepath by '/' and expand into separate columns
-    # split_cols = df_raw[0].split("/")
-    # print(f"split_cols: \n{split_cols}")
 
-    # TICKER,COUNTRY,EXCHANGE,FILEPATH
-    df_formatted = pd.DataFrame(columns=["COUNTRY", "EXCHANGE", "TICKER", "FILEPATH"])
-    
-    #
-    # # Ok, it looks like:
-
-    # iloc goes from 3 to 24535
-    # skip lines that don't end in ".txt"
-
-    # 1. country is in split("/")[1]
-    # 2. exchange is in split("/")[2]
-    # 3. "ticker.code.txt" is in split("/")[len - 1]
-    # 4. "path" is FROM THE STOOQ FOLDER, so be sure to append relative_folderpath when accessing
-
-    # iloc goes from 3 to 24535 for the full range
-    endIndex = 100
-    if fullService:
-        endIndex = row_count # write the full output
-
-    linesToWrite = []
-    linesToWrite.append("TICKER,COUNTRY,EXCHANGE,FILEPATH\n")
-    print(linesToWrite)
-    for i in range(3, endIndex):
+# Columns of filepathsformatted.txt. The last five come from the scan itself:
+#   SIZE / MTIME -- the file's stat, so a re-scan can tell whether it changed
+#   FIRST_DATE / LAST_DATE / ROWS -- the bars in the file (blank / 0 for an empty file)
+index_columns = ["TICKER", "COUNTRY", "EXCHANGE", "FILEPATH", "SIZE", "MTIME", "FIRST_DATE", "LAST_DATE", "ROWS"]
+
+
+# Loads filepathsformatted.txt with proper types. Older files with just the first four columns still load.
+def loadFormatted(path=formatted_datapath) -> "pd.DataFrame":
+    import pandas as pd
+    df = pd.read_csv(path, dtype={"TICKER": str, "COUNTRY": str, "EXCHANGE": str, "FILEPATH": str},
+                     keep_default_na=False, na_values={"FIRST_DATE": [""], "LAST_DATE": [""]})
+    for col in ["FIRST_DATE", "LAST_DATE"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format="%Y-%m-%d")
+    for col in ["SIZE", "MTIME", "ROWS"]:
+        if col in df.columns:
+            df[col] = df[col].astype("int64")
+    return df
+
+
+# One streaming pass over a stooq file: (first date, last date, bar count).
+# Reads in big binary blocks and only ever decodes the first and last line.
+def _scanFile(path, blockSize=1 << 20):
+    rows = -1  # the header line doesn't count
+    first = None
+    tail = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(blockSize)
+            if not block:
+                break
+            rows += block.count(b"\n")
+            tail = (tail + block)[-4096:]
+            if first is None:
+                lines = block.split(b"\n", 2)
+                if len(lines) > 2 or (len(lines) == 2 and lines[1].strip()):
+                    first = lines[1]
+    if tail and not tail.endswith(b"\n"):
+        rows += 1  # last line without a trailing newline
+    lines = [l for l in tail.split(b"\n") if l.strip()]
+    if rows <= 0 or first is None or not lines or lines[-1].startswith(b"<"):
+        return "", "", 0
+
+    def day(line):
+        d = line.split(b",")[2].decode()
+        return f"{d[:4]}-{d[4:6]}-{d[6:8]}"
+    return day(first), day(lines[-1]), rows
+
+
+# Walks one country/exchange directory with scandir and returns its index rows.
+# previous: {FILEPATH: row} from the last index -- files whose size and mtime haven't changed
+# reuse their old dates/row count instead of being read again.
+# (module-level so ProcessPoolExecutor can pickle it)
+def _scanExchangeDir(args):
+    root, country, exchange, previous = args
+    rows = []
+    stack = [os.path.join(root, country, exchange)]
+    while stack:
+        folder = stack.pop()
         try:
-            row = df_raw.iloc[i][0]
-            splitdata = row.split("/")
-            if splitdata[-1].split(".")[-1] != "txt":
-                print(f"no ticker at {row}")
-            else:
-                # print(f"splitdata, iloc at {i} = {splitdata}")
-                country = splitdata[1]
-                exchange = splitdata[2]
-                ticker = splitdata[-1].split(".")[0]
-                path = row[2:]
-
-                newline=f"{ticker},{country},{exchange},{path}\n"
-                print(newline, end='')
-                linesToWrite.append(newline)
-                # print(f"successfully parsed {row}")
-
-        except Exception as e:
-            print(f"exception at {i}, {e}")
-
-
-    # Now, to write the final file.
+            entries = sorted(os.scandir(folder), key=lambda e: e.name)
+        except OSError as e:
+            print(f"[Warning] couldn't scan {folder}, {e}")
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+                continue
+            if not entry.name.endswith(".txt"):
+                continue
+            stat = entry.stat()
+            filepath = os.path.relpath(entry.path, root).replace(os.sep, "/")
+            old = previous.get(filepath)
+            if old is not None and old[4] == stat.st_size and old[5] == stat.st_mtime_ns:
+                rows.append(old)
+                continue
+            try:
+                first, last, count = _scanFile(entry.path)
+            except Exception as e:
+                print(f"[Warning] couldn't read {filepath}, {e}")
+                first, last, count = "", "", 0
+            ticker = entry.name.split(".")[0]
+            rows.append((ticker, country, exchange, filepath, stat.st_size, stat.st_mtime_ns, first, last, count))
+        stack.extend(reversed(subdirs))
+    return rows
+
+
+# Rebuilds filepathsformatted.txt straight from the stooq folder (no "find ." needed).
+# Every <country>/<exchange> directory is scanned in its own process. If an index with the
+# SIZE/MTIME columns already exists, files that haven't changed since are not read again.
+def buildFormatted(root=relative_folderpath, outPath=formatted_datapath, workers=None, incremental=True) -> "pd.DataFrame":
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+
+    previous = {}
+    if incremental and os.path.exists(outPath):
+        old = pd.read_csv(outPath, dtype=str, keep_default_na=False)
+        if all(col in old.columns for col in index_columns):
+            for row in old[index_columns].itertuples(index=False):
+                previous[row.FILEPATH] = (row.TICKER, row.COUNTRY, row.EXCHANGE, row.FILEPATH, int(row.SIZE),
+                                          int(row.MTIME), row.FIRST_DATE, row.LAST_DATE, int(row.ROWS))
+
+    # COUNTRY = the top level folder, EXCHANGE = the folder under that (same as the old find-based split)
+    units = []
+    for country in sorted(e.name for e in os.scandir(root) if e.is_dir()):
+        for exchange in sorted(e.name for e in os.scandir(os.path.join(root, country)) if e.is_dir()):
+            prefix = f"{country}/{exchange}/"
+            mine = {k: v for k, v in previous.items() if k.startswith(prefix)}
+            units.append((root, country, exchange, mine))
+    print(f"Indexing {len(units)} exchange folders under {root} ({len(previous)} files already indexed)")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_scanExchangeDir, units))
+    rows = [row for part in parts for row in part]
+    reused = sum(1 for row in rows if previous.get(row[3]) == row)
+
+    df = pd.DataFrame(rows, columns=index_columns)
+    os.makedirs(os.path.dirname(outPath) or ".", exist_ok=True)
+    df.to_csv(outPath + ".tmp", index=False)
+    os.replace(outPath + ".tmp", outPath)
+    print(f"Wrote {len(df)} symbols to {outPath} ({len(df) - reused} scanned, {reused} unchanged)")
+    return loadFormatted(outPath)
+
+
+# (mtime, size) of the text index, stored in the pickles so they know when they're out of date
+def _sourceStamp(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _writePickle(path, obj):
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+
+
+# Returns the pickled object if it was built from the current version of source, else None
+def _readPickle(path, source):
     try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(formatted_datapath), exist_ok=True)  # only if you have subfolders
-
-        # Open in write mode (overwrites existing file)
-        with open(formatted_datapath, "w") as f:
-            for line in linesToWrite:
-                f.write(line)
-
-    except Exception as e:
-            print(f"exception: {e}")
-
-
+        with open(path, "rb") as f:
+            stamp, obj = pickle.load(f)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+    return obj if stamp == _sourceStamp(source) else None
+
+
+# Rebuilds frame.pkl and lookup.pkl from the text index. Returns (df, lookup).
+def buildBinary(source=formatted_datapath, folder=binary_folderpath):
+    stamp = _sourceStamp(source)
+    df = loadFormatted(source)
+    for col in ["TICKER", "COUNTRY", "EXCHANGE"]:
+        df[col] = df[col].astype("category")
+    lookup = {"index": TickerSource.buildIndex(df), "coverage": TickerSource.buildCoverage(df)}
+
+    os.makedirs(folder, exist_ok=True)
+    _writePickle(os.path.join(folder, "frame.pkl"), (stamp, df))
+    _writePickle(os.path.join(folder, "lookup.pkl"), (stamp, lookup))
+    return df, lookup
+
+
+# {"index": (ticker, country) lookup, "coverage": per-file coverage}, from lookup.pkl when it's
+# current (no pandas involved)
+def loadLookup(source=formatted_datapath, folder=binary_folderpath) -> dict:
+    lookup = _readPickle(os.path.join(folder, "lookup.pkl"), source)
+    if not isinstance(lookup, dict) or "coverage" not in lookup:
+        lookup = buildBinary(source, folder)[1]
+    return lookup
+
+
+# The whole dataframe, from frame.pkl when it's current
+def loadFrame(source=formatted_datapath, folder=binary_folderpath) -> "pd.DataFrame":
+    df = _readPickle(os.path.join(folder, "frame.pkl"), source)
+    if df is None:
+        df = buildBinary(source, folder)[0]
+    return df
+
+
+# Creates the formatted list. Used to parse filepaths.txt (the output of a manual "find .");
+# now it just scans the stooq folder directly, see buildFormatted.
+# fullService=False is a dry run: scans everything but only prints the first rows.
+def formatFromRaw(fullService=True):
     if fullService:
+        buildFormatted()
         print("Done running formatFromRaw() with full service")
     else:
+        with tempfile.TemporaryDirectory() as tmp:
+            df = buildFormatted(outPath=os.path.join(tmp, "filepathsformatted.txt"), incremental=False)
+        print(df.head(10))
         print("Done testing formatFromRaw()")
 
-        
 
-# TICKER,COUNTRY,EXCHANGE,FILEPATH
-if build_new_formatted_list:
+# TICKER,COUNTRY,EXCHANGE,FILEPATH,SIZE,MTIME,FIRST_DATE,LAST_DATE,ROWS
+# (only when run directly -- the process pool re-imports this module in its workers)
+if __name__ == "__main__" and build_new_formatted_list:
     formatFromRaw()
-
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from indicators import typicalPrice
+
+# Vectorised trailing stop simulator.
+# Price model: one price per day, the HLC/3 "typical price" ((high + low + close) / 3).
+#
+# For an entry on day i0 and a trailing stop of p%:
+#   running max  = highest typical price since entry (np.maximum.accumulate)
+#   stop level   = running max * (1 - p/100)
+#   fill         = first day after entry where the typical price is at/below the stop level
+#
+# All percents for one entry date are evaluated at once as a (percents x days) matrix,
+# so sweeping thousands of stop sizes is one NumPy pass per entry date, not one Python loop per scenario.
+
+result_columns = ["ENTRY_DATE", "PERCENT", "ENTRY_PRICE", "MAX_PRICE", "MAX_DATE",
+                  "FILLED", "FILL_DATE", "FILL_PRICE", "STOP_PRICE"]
+
+
+# dates:      sorted datetime64 array, one per trading day
+# price:      typical price for each of those days
+# percents:   scalar or array, in percent (15 means a 15% trailing stop)
+# entryDates: scalar or array. Each one enters on the first trading day at/after it.
+# endDate:    last day the order can fill on (default: the last day in dates)
+#
+# Returns a DataFrame with one row per (entry date, percent), columns = result_columns.
+# Unfilled orders have FILLED = False and NaT / NaN fill date / price.
+def simulateTrailingStop(dates, price, percents, entryDates, endDate=None) -> pd.DataFrame:
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    price = np.asarray(price, dtype="f8")
+    percents = np.atleast_1d(np.asarray(percents, dtype="f8"))
+    entryDates = np.atleast_1d(np.asarray(entryDates, dtype="datetime64[ns]"))
+
+    if np.any(percents <= 0) or np.any(percents >= 100):
+        raise ValueError(f"trailing stop percents must be between 0 and 100, got {percents}")
+
+    iEnd = len(dates)
+    if endDate is not None:
+        iEnd = np.searchsorted(dates, np.datetime64(endDate, "ns"), side="right")
+
+    keep = 1.0 - percents / 100.0
+    P = len(percents)
+    rows = np.arange(P)
+    parts = []
+
+    for entry in entryDates:
+        i0 = np.searchsorted(dates, entry, side="left")
+        part = {
+            "ENTRY_DATE": np.full(P, dates[i0] if i0 < len(dates) else entry),
+            "PERCENT": percents,
+        }
+
+        if i0 >= iEnd:
+            # Nothing traded between the entry and the end date
+            part["ENTRY_PRICE"] = np.full(P, np.nan)
+            part["MAX_PRICE"] = np.full(P, np.nan)
+            part["MAX_DATE"] = np.full(P, np.datetime64("NaT", "ns"))
+            part["FILLED"] = np.zeros(P, dtype=bool)
+            part["FILL_DATE"] = np.full(P, np.datetime64("NaT", "ns"))
+            part["FILL_PRICE"] = np.full(P, np.nan)
+            part["STOP_PRICE"] = np.full(P, np.nan)
+            parts.append(pd.DataFrame(part))
+            continue
+
+        seg = price[i0:iEnd]
+        n = len(seg)
+        runMax = np.maximum.accumulate(seg)
+        # index of the day the running max was set, carried forward the same way
+        runMaxIdx = np.maximum.accumulate(np.where(seg >= runMax, np.arange(n), 0))
+
+        # (percents x days): did the price hit the stop on that day?
+        stops = runMax[None, :] * keep[:, None]
+        breach = seg[None, :] <= stops
+        breach[:, 0] = False  # can't fill on the day we enter
+
+        first = breach.argmax(axis=1)
+        filled = breach[rows, first]
+        last = np.where(filled, first, n - 1)
+
+        part["ENTRY_PRICE"] = np.full(P, seg[0])
+        part["MAX_PRICE"] = runMax[last]
+        part["MAX_DATE"] = dates[i0 + runMaxIdx[last]]
+        part["FILLED"] = filled
+        part["FILL_DATE"] = np.where(filled, dates[i0 + first], np.datetime64("NaT", "ns"))
+        part["FILL_PRICE"] = np.where(filled, seg[first], np.nan)
+        part["STOP_PRICE"] = stops[rows, last]
+        parts.append(pd.DataFrame(part))
+
+    return pd.concat(parts, ignore_index=True)[result_columns]
+
+
+# Same thing, straight from a Stooq-style frame (DATE, HIGH, LOW, CLOSE), sorted by DATE
+def simulateFromFrame(df, percents, entryDates, endDate=None) -> pd.DataFrame:
+    price = typicalPrice(df["HIGH"], df["LOW"], df["CLOSE"])
+    return simulateTrailingStop(df["DATE"].to_numpy(), price, percents, entryDates, endDate)
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import json
+import os
+import time
+import stooqCache
+import trailingStop
+from tickerSource import TickerSource
+
+# Runs the trailing stop simulator over the whole ticker universe:
+#   every symbol in TickerSource.df  x  every percent  x  every entry date
+#
+# The symbols are split into fixed partitions (in TickerSource.df order). Each partition is one job
+# for a ProcessPoolExecutor worker, which loads each file once (memory-mapped through stooqCache),
+# evaluates the whole parameter grid on it, and writes one columnar part file:
+#   <outFolder>/part_00000.npz, part_00001.npz, ...
+#
+# Part files are written to a temp name and renamed at the end, so a part file existing means
+# that partition is done. Re-running the same batch after an interruption skips those.
+
+results_folderpath = "data/results/trailingstop/"
+
+
+# Column dtypes in the part files (plain NumPy types, so they load without pickle)
+part_dtypes = {
+    "TICKER": str, "COUNTRY": str, "EXCHANGE": str,
+    "ENTRY_DATE": "M8[ns]", "PERCENT": "f8", "ENTRY_PRICE": "f8", "MAX_PRICE": "f8", "MAX_DATE": "M8[ns]",
+    "FILLED": bool, "FILL_DATE": "M8[ns]", "FILL_PRICE": "f8", "STOP_PRICE": "f8",
+}
+
+
+def _partPath(outFolder, partId):
+    return os.path.join(outFolder, f"part_{partId:05d}.npz")
+
+
+# Runs one partition. rows = [(ticker, country, exchange, filepath), ...]
+# (module-level so ProcessPoolExecutor can pickle it)
+def _runPartition(partId, rows, percents, entryDates, endDate, outFolder):
+    frames = []
+    for (ticker, country, exchange, filepath), arr, meta in stooqCache.iterDailyArrays(rows):
+        price = trailingStop.typicalPrice(arr["HIGH"], arr["LOW"], arr["CLOSE"])
+        res = trailingStop.simulateTrailingStop(arr["DATE"], price, percents, entryDates, endDate)
+        # entry dates after the symbol stopped trading have nothing to report
+        res = res[res["ENTRY_PRICE"].notna()]
+        if res.empty:
+            continue
+
+        frames.append(stooqCache.withLabels(res, {"TICKER": ticker, "COUNTRY": country, "EXCHANGE": exchange}))
+
+    if frames:
+        out = pd.concat(frames, ignore_index=True)
+        columns = {}
+        for col in out.columns:
+            columns[col] = out[col].to_numpy(dtype=part_dtypes[col])
+    else:
+        # typed empty columns -- an untyped empty frame is all object dtype, which np.savez can
+        # only store pickled, and loadResults (allow_pickle=False) can't read back
+        columns = {col: np.empty(0, dtype=dtype) for col, dtype in part_dtypes.items()}
+
+    path = _partPath(outFolder, partId)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, **columns)
+    os.replace(path + ".tmp", path)
+
+    return partId, len(rows), len(columns["TICKER"])
+
+
+# percents:      list of trailing stop sizes, in percent
+# entryDates:    list of entry dates (each enters on the first trading day at/after it)
+# endDate:       last day an order can fill (default: end of each file)
+# index:         optional subset of TickerSource.df to run on (default: the whole universe)
+# partitionSize: symbols per worker job
+# workers:       process count (default: os.cpu_count())
+def runBatch(percents, entryDates, endDate=None, index=None, outFolder=results_folderpath,
+             partitionSize=250, workers=None):
+    if index is None:
+        index = TickerSource().df
+
+    percents = [float(p) for p in np.atleast_1d(percents)]
+    entryDates = [str(np.datetime64(d, "D")) for d in np.atleast_1d(np.asarray(entryDates, dtype="datetime64[D]"))]
+    endDate = str(np.datetime64(endDate, "D")) if endDate is not None else None
+
+    # The manifest pins down the parameters, so resuming can't silently mix two different batches.
+    # Partitions are slices of the index in its current order, so that order is pinned too (as a hash):
+    # a rebuilt index with the same count but a different order would otherwise split differently.
+    os.makedirs(outFolder, exist_ok=True)
+    symbolsHash = hashlib.sha1("\n".join(index["FILEPATH"]).encode("utf-8")).hexdigest()
+    manifest = {
+        "percents": percents,
+        "entryDates": entryDates,
+        "endDate": endDate,
+        "partitionSize": partitionSize,
+        "symbols": len(index),
+        "symbolsHash": symbolsHash,
+    }
+    manifestPath = os.path.join(outFolder, "batch.json")
+    if os.path.exists(manifestPath):
+        with open(manifestPath, "r") as f:
+            previous = json.load(f)
+        if previous != manifest and dict(previous, symbolsHash=symbolsHash) == manifest:
+            raise Exception(f"{outFolder} was partitioned from a differently ordered ticker index "
+                            f"(it's been rebuilt since). Use a new outFolder or delete it first.")
+        if previous != manifest:
+            raise Exception(f"{outFolder} already holds a different batch. Use a new outFolder or delete it first.")
+    else:
+        with open(manifestPath, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    allRows = list(zip(index["TICKER"], index["COUNTRY"], index["EXCHANGE"], index["FILEPATH"]))
+    partitions = [allRows[i:i + partitionSize] for i in range(0, len(allRows), partitionSize)]
+    todo = [i for i in range(len(partitions)) if not os.path.exists(_partPath(outFolder, i))]
+
+    print(f"Trailing stop batch: {len(allRows)} symbols x {len(percents)} percents x {len(entryDates)} entry dates")
+    print(f"{len(partitions)} partitions, {len(partitions) - len(todo)} already done, {len(todo)} to go")
+    if not todo:
+        return outFolder
+
+    start = time.time()
+    symbolsDone = 0
+    rowsDone = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_runPartition, i, partitions[i], percents, entryDates, endDate, outFolder) for i in todo]
+        for k, future in enumerate(as_completed(futures), start=1):
+            try:
+                partId, nSymbols, nRows = future.result()
+            except Exception as e:
+                print(f"[Warning] partition failed, it'll be retried on the next run: {e}")
+                continue
+            symbolsDone += nSymbols
+            rowsDone += nRows
+
+            elapsed = time.time() - start
+            eta = elapsed / k * (len(todo) - k)
+            print(f"[{k}/{len(todo)}] part {partId} done -- {symbolsDone} symbols, {rowsDone} results, "
+                  f"{elapsed:.0f}s elapsed, ~{eta:.0f}s left")
+
+    print(f"Done running trailing stop batch into {outFolder}")
+    return outFolder
+
+
+# Reads every finished part file back into one DataFrame
+def loadResults(outFolder=results_folderpath) -> pd.DataFrame:
+    names = sorted(n for n in os.listdir(outFolder) if n.startswith("part_") and n.endswith(".npz"))
+    frames = []
+    for name in names:
+        with np.load(os.path.join(outFolder, name)) as part:
+            frames.append(pd.DataFrame({col: part[col] for col in part.files}))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    # Example sweep: 1% to 30% stops, entered on the first trading day of every year since 1995
+    runBatch(percents=np.arange(1, 31),
+             entryDates=[f"{y}-01-01" for y in range(1995, 2025)])
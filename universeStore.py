@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+import stooqCache
+from tickerSource import TickerSource, relative_folderpath
+
+# Packs every daily series listed in filepathsformatted.txt into one set of contiguous arrays:
+#   DATE, OPEN, HIGH, LOW, CLOSE, VOLUME   (one .npy each, all the same length)
+# plus a per-symbol offset table (symbols.csv) saying which rows belong to which ticker.
+# Symbol i owns rows [START[i], END[i]) and those rows are sorted by date.
+#
+# Reading it back is just a memory-map, so a scan across all ~24k symbols doesn't have to
+# open 24k files or hold 24k DataFrames in RAM.
+
+universe_folderpath = "data/cache/universe/"
+
+columns = ["DATE", "OPEN", "HIGH", "LOW", "CLOSE", "VOLUME"]
+dtypes = {"DATE": "M8[D]", "OPEN": "f8", "HIGH": "f8", "LOW": "f8", "CLOSE": "f8", "VOLUME": "f8"}
+
+
+# Builds the store from the TickerSource index.
+# Two passes: the first one loads every file through stooqCache (which builds the per-file cache
+# if needed) just to count rows, the second one copies the rows into the final preallocated arrays.
+# Neither pass holds more than one series in memory at a time.
+def buildUniverse(folder=universe_folderpath, printEvery=1000):
+    src = TickerSource()
+    index = src.df
+
+    print(f"Building universe store from {len(index)} indexed files")
+
+    # Pass 1: row counts
+    # (only daily series go in here)
+    keep = []
+    lengths = []
+    rows = index.itertuples(index=False)
+    for i, (row, arr, meta) in enumerate(stooqCache.iterDailyArrays(rows, lambda r: r.FILEPATH)):
+        keep.append(row)
+        lengths.append(len(arr))
+
+        if printEvery and (i + 1) % printEvery == 0:
+            print(f"counted {i + 1}/{len(index)}")
+
+    lengths = np.asarray(lengths, dtype="i8")
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    total = int(ends[-1]) if len(ends) > 0 else 0
+
+    # Pass 2: fill the arrays
+    os.makedirs(folder, exist_ok=True)
+    out = {}
+    for col in columns:
+        out[col] = np.lib.format.open_memmap(os.path.join(folder, f"{col}.npy.tmp"), mode="w+",
+                                             dtype=dtypes[col], shape=(total,))
+
+    for i, row in enumerate(keep):
+        filepath = f"{relative_folderpath}{row.FILEPATH}"
+        arr, meta = stooqCache.loadArrays(filepath)
+        s, e = starts[i], ends[i]
+        for col in columns:
+            out[col][s:e] = arr[col]
+
+        if printEvery and (i + 1) % printEvery == 0:
+            print(f"packed {i + 1}/{len(keep)}")
+
+    for col in columns:
+        out[col].flush()
+        del out[col]
+        os.replace(os.path.join(folder, f"{col}.npy.tmp"), os.path.join(folder, f"{col}.npy"))
+
+    symbols = pd.DataFrame({
+        "TICKER": [r.TICKER for r in keep],
+        "COUNTRY": [r.COUNTRY for r in keep],
+        "EXCHANGE": [r.EXCHANGE for r in keep],
+        "FILEPATH": [r.FILEPATH for r in keep],
+        "START": starts,
+        "END": ends,
+    })
+    symbols.to_csv(os.path.join(folder, "symbols.csv"), index=False)
+
+    with open(os.path.join(folder, "meta.json"), "w") as f:
+        json.dump({"rows": total, "symbols": len(keep), "dtypes": dtypes}, f, indent=2)
+
+    print(f"Done building universe store: {len(keep)} symbols, {total} rows")
+    return folder
+
+
+# Read-only view over a store made by buildUniverse()
+class UniverseStore:
+    def __init__(self, folder=universe_folderpath):
+        self.folder = folder
+        # Same parsing as tickerSource.loadFormatted, so tickers like "nan" or "7203" stay strings
+        self.symbols = pd.read_csv(os.path.join(folder, "symbols.csv"),
+                                   dtype={"TICKER": str, "COUNTRY": str, "EXCHANGE": str, "FILEPATH": str},
+                                   keep_default_na=False)
+        self.arrays = {col: np.load(os.path.join(folder, f"{col}.npy"), mmap_mode="r") for col in columns}
+        self.starts = self.symbols["START"].to_numpy()
+        self.ends = self.symbols["END"].to_numpy()
+
+        # (ticker, country) -> list of row numbers in self.symbols
+        # Some tickers exist on more than one exchange, so this can't be a plain 1:1 map
+        self._lookup = {}
+        for i, (t, c) in enumerate(zip(self.symbols["TICKER"], self.symbols["COUNTRY"])):
+            self._lookup.setdefault((str(t).lower(), str(c).lower()), []).append(i)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def numRows(self):
+        return len(self.arrays["DATE"])
+
+    # Returns the symbol number (row in self.symbols) for a ticker, or None
+    def symbolId(self, ticker:str, country:str, exchange=None):
+        ids = self._lookup.get((ticker.lower(), country.lower()), [])
+        if exchange is not None:
+            ids = [i for i in ids if self.symbols["EXCHANGE"].iloc[i] == exchange]
+        if len(ids) == 0:
+            return None
+        return ids[0]
+
+    # Returns zero-copy views of every column for symbol number i
+    def seriesArrays(self, i) -> dict:
+        s, e = self.starts[i], self.ends[i]
+        return {col: self.arrays[col][s:e] for col in columns}
+
+    # Returns a (small) DataFrame for one symbol, optionally limited to [day1, day2]
+    def series(self, ticker:str, country:str, day1=None, day2=None, exchange=None) -> pd.DataFrame:
+        i = self.symbolId(ticker, country, exchange)
+        if i is None:
+            print(f"[Warning] {ticker}.{country} is not in the universe store")
+            return pd.DataFrame()
+
+        arrs = self.seriesArrays(i)
+        lo, hi = 0, len(arrs["DATE"])
+        if day1 is not None:
+            lo = np.searchsorted(arrs["DATE"], np.datetime64(day1, "D"), side="left")
+        if day2 is not None:
+            hi = np.searchsorted(arrs["DATE"], np.datetime64(day2, "D"), side="right")
+
+        df = pd.DataFrame({col: arrs[col][lo:hi] for col in columns})
+        df["DATE"] = df["DATE"].astype("datetime64[ns]")
+        return df
+
+    # Maps global row numbers back to symbol numbers
+    def rowsToSymbols(self, rows):
+        return np.searchsorted(self.ends, rows, side="right")
+
+    # Every symbol's bar on one day, as one DataFrame -- a single vectorised pass over the DATE array
+    def crossSection(self, day) -> pd.DataFrame:
+        rows = np.flatnonzero(self.arrays["DATE"] == np.datetime64(day, "D"))
+        ids = self.rowsToSymbols(rows)
+
+        df = self.symbols.iloc[ids][["TICKER", "COUNTRY", "EXCHANGE"]].reset_index(drop=True)
+        for col in columns[1:]:
+            df[col] = self.arrays[col][rows]
+        return df
+
+
+# python3 universeStore.py  -->  (re)builds the store from the current filepathsformatted.txt
+if __name__ == "__main__":
+    buildUniverse()